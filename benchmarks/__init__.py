@@ -0,0 +1,100 @@
+'''
+A small benchmark harness.
+
+Each scenario is a function which performs any setup, and returns a tuple of
+(callable, ops), where ops is the number of operations (such as rows) each
+call performs.
+'''
+import gc
+import json
+import time
+import tracemalloc
+
+SCENARIOS = []
+
+
+def scenario(func):
+    '''Register a benchmark scenario.'''
+    SCENARIOS.append(func)
+    return func
+
+
+def measure(func, ops, min_time=0.2, repeat=5):
+    '''
+    Time func, returning a dict of the best ops/sec over ``repeat`` rounds,
+    and the peak memory allocated by a single call.
+    '''
+    # Warm up, and calibrate the number of calls per round.
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    best = elapsed
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'ops_per_sec': ops * number / best,
+        'peak_kib': peak / 1024,
+    }
+
+
+def run(names=None, **kwargs):
+    '''
+    Run the registered scenarios, or only those in names, yielding
+    (name, result) for each.
+    '''
+    for func in SCENARIOS:
+        name = func.__name__
+        if names and name not in names:
+            continue
+        call, ops = func()
+        yield name, measure(call, ops, **kwargs)
+
+
+def load(path):
+    with open(path) as fin:
+        return json.load(fin)
+
+
+def save(path, results):
+    with open(path, 'w') as fout:
+        json.dump(results, fout, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Yield (name, change, regressed) for each result also in baseline, where
+    change is the relative change in ops/sec, and regressed is True if it is
+    slower by more than tolerance.
+    '''
+    for name, result in results.items():
+        try:
+            base = baseline[name]['ops_per_sec']
+        except KeyError:
+            continue
+        change = result['ops_per_sec'] / base - 1
+        yield name, change, change < -tolerance
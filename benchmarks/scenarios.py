@@ -0,0 +1,195 @@
+'''
+Benchmark scenarios, using the models from the test suite.
+'''
+import json
+from datetime import datetime, timezone
+
+from django.test import RequestFactory
+
+from nap import mapper
+from nap.extras.actions import ExportCsv
+from nap.extras.simplecsv import Writer
+from nap.http.response import JsonResponse
+from nap.utils.ripper import Ripper
+
+from tests import rest_views, rpc_views
+from tests.models import Choice, Poll
+
+from . import scenario
+
+ROWS = 10000
+PUB_DATE = datetime(2016, 5, 13, tzinfo=timezone.utc)
+
+
+class PollMapper(mapper.ModelMapper):
+    class Meta:
+        model = Poll
+        fields = ['question', 'pub_date', 'kill_date']
+
+
+class UncompiledPollMapper(PollMapper):
+    _compile_reduce = False
+
+
+class ChoiceMapper(mapper.ModelMapper):
+    class Meta:
+        model = Choice
+        fields = '__all__'
+
+    poll = mapper.ToOneField('poll', mapper=PollMapper)
+
+
+def make_polls(count=ROWS):
+    return [
+        Poll(id=idx, question='Question %d' % idx, pub_date=PUB_DATE)
+        for idx in range(1, count + 1)
+    ]
+
+
+def make_choices(count=ROWS):
+    polls = make_polls(10)
+    return [
+        Choice(id=idx, poll=polls[idx % 10], choice_text='Choice %d' % idx, votes=idx)
+        for idx in range(1, count + 1)
+    ]
+
+
+def populate():
+    '''Fill the database, if it is empty.'''
+    if Poll.objects.exists():
+        return
+    Poll.objects.bulk_create(make_polls())
+    Choice.objects.bulk_create([
+        Choice(poll_id=idx % 10 + 1, choice_text='Choice %d' % idx, votes=idx)
+        for idx in range(ROWS)
+    ])
+
+
+@scenario
+def reduce_list():
+    polls = make_polls()
+    return (lambda: PollMapper._reduce_many(polls)), ROWS
+
+
+@scenario
+def reduce_list_uncompiled():
+    polls = make_polls()
+    return (lambda: UncompiledPollMapper._reduce_many(polls)), ROWS
+
+
+@scenario
+def reduce_single():
+    poll, = make_polls(1)
+    m = PollMapper()
+    return (lambda: m << poll), 1
+
+
+@scenario
+def reduce_nested():
+    choices = make_choices()
+    return (lambda: ChoiceMapper._reduce_many(choices)), ROWS
+
+
+@scenario
+def apply():
+    data = {'question': 'Question', 'pub_date': '2016-05-13 00:00:00', 'kill_date': None}
+
+    def run():
+        for _ in range(100):
+            PollMapper(Poll())._apply(data)
+    return run, 100
+
+
+@scenario
+def patch():
+    data = {'question': 'Question'}
+    poll, = make_polls(1)
+
+    def run():
+        for _ in range(100):
+            PollMapper(poll)._patch(data)
+    return run, 100
+
+
+@scenario
+def mapper_class():
+
+    def run():
+        class M(mapper.ModelMapper):
+            class Meta:
+                model = Choice
+                fields = '__all__'
+    return run, 1
+
+
+@scenario
+def csv_write():
+    rows = [[idx, 'Question, %d' % idx, 'say "hi"'] for idx in range(ROWS)]
+    csv = Writer(fields=['id', 'question', 'note'])
+
+    def run():
+        for row in rows:
+            csv.write(row)
+    return run, ROWS
+
+
+@scenario
+def csv_export():
+    populate()
+
+    class PollAdmin:
+        model = Poll
+
+    action = ExportCsv(PollMapper)
+    admin = PollAdmin()
+
+    def run():
+        # A fresh queryset each round, so its result cache is not reused.
+        for chunk in action(admin, None, Poll.objects.all()).streaming_content:
+            pass
+    return run, ROWS
+
+
+@scenario
+def ripper():
+    polls = make_polls()
+    rip = Ripper('id', 'question', 'pub_date')
+
+    def run():
+        for poll in polls:
+            rip(poll)
+    return run, ROWS
+
+
+@scenario
+def json_response():
+    data = PollMapper._reduce_many(make_polls())
+    return (lambda: JsonResponse(data, safe=False)), ROWS
+
+
+@scenario
+def list_view():
+    populate()
+    view = rest_views.PollListView.as_view(mapper_class=PollMapper)
+    request = RequestFactory().get('/')
+    return (lambda: view(request)), ROWS
+
+
+@scenario
+def list_view_values():
+    populate()
+    view = rest_views.PollListView.as_view(mapper_class=PollMapper, use_values=True)
+    request = RequestFactory().get('/')
+    return (lambda: view(request)), ROWS
+
+
+@scenario
+def rpc_dispatch():
+    view = rpc_views.View.as_view()
+    body = json.dumps({'a': 1, 'b': [1, 2, 3]})
+    factory = RequestFactory()
+
+    def run():
+        request = factory.post('/', body, content_type='application/json', HTTP_X_RPC_ACTION='echo')
+        view(request)
+    return run, 1
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+'''
+Run the benchmark suite.
+
+    python runbenchmarks.py [-s baseline.json] [-c baseline.json] [name ...]
+
+Reports ops/sec and peak allocated memory for each scenario.  With --compare,
+exits with status 1 if any scenario is slower than the baseline by more than
+the tolerance.
+'''
+import argparse
+import sys
+
+from django.conf import settings
+
+import django
+
+
+if not settings.configured:
+    settings.configure(
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=(
+            'tests',
+        ),
+        ROOT_URLCONF='tests.urls',
+        USE_TZ=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the django-nap benchmarks.')
+    parser.add_argument('names', nargs='*', help='Only run these scenarios.')
+    parser.add_argument('-s', '--save', help='Save results to this file.')
+    parser.add_argument('-c', '--compare', help='Compare results to this file.')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.1,
+                        help='Allowed slow down when comparing.  Default: 0.1')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='Minimum seconds for each round.  Default: 0.2')
+    args = parser.parse_args()
+
+    django.setup()
+
+    from django.core.management import call_command
+
+    import benchmarks
+    from benchmarks import scenarios  # NOQA
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+    results = {}
+    print('%-24s %16s %12s' % ('scenario', 'ops/sec', 'peak KiB'))
+    for name, result in benchmarks.run(args.names, min_time=args.min_time):
+        results[name] = result
+        print('%-24s %16.1f %12.1f' % (name, result['ops_per_sec'], result['peak_kib']))
+
+    if args.save:
+        benchmarks.save(args.save, results)
+
+    if args.compare:
+        baseline = benchmarks.load(args.compare)
+        failed = False
+        print()
+        print('%-24s %10s' % ('scenario', 'change'))
+        for name, change, regressed in benchmarks.compare(results, baseline, args.tolerance):
+            print('%-24s %+9.1f%%%s' % (name, change * 100, '  SLOWER' if regressed else ''))
+            failed = failed or regressed
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -32,7 +32,8 @@ setup(
         'Django (>=2.0)',
     ],
     extras_require={
-        'rpc': ['requests'],
+        'rpc': ['requests', 'urllib3>=1.26'],
+        'msgpack': ['msgpack'],
     },
     install_requires = [
         'Django>=2.0',
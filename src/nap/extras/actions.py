@@ -19,7 +19,7 @@ class ExportCsv:
         self.__name__ = label or 'ExportCsv'
 
     def __call__(self, admin, request, queryset):
-        mapper = self.mapper()
+        mapper = self.mapper
 
         select_related = self.opts.get('select_related', None)
         if select_related:
@@ -31,8 +31,7 @@ class ExportCsv:
         def inner():
             csv = Writer(fields=self.opts.get('fields', mapper._fields.keys()))
             yield csv.write_headers()
-            for obj in queryset:
-                data = mapper << obj
+            for data in mapper._iter_reduce(queryset):
                 yield csv.write_dict(data)
 
         response = StreamingHttpResponse(inner(), content_type='text/csv')
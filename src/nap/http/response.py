@@ -1,11 +1,61 @@
-from django.http import StreamingHttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
 from nap.utils import NapJSONEncoder
+from nap.utils.backends import get_backend
+from nap.utils.formats import get_format
+
+
+class JsonResponse(HttpResponse):
+    """
+    An HTTP response class that serialises data to JSON using the configured
+    JSON backend.
+
+    Accepts the same arguments as ``django.http.JsonResponse``, but the
+    encoder defaults to ``NapJSONEncoder``.
+    """
+
+    def __init__(self, data, encoder=NapJSONEncoder, safe=True,
+                 json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        if json_dumps_params is None:
+            json_dumps_params = {}
+        kwargs.setdefault('content_type', 'application/json')
+        data = get_backend().dumps(data, encoder, **json_dumps_params)
+        super().__init__(content=data, **kwargs)
+
+
+class MsgpackResponse(HttpResponse):
+    '''
+    An HTTP response class that serialises data using MessagePack.
+
+    Accepts the same arguments as JsonResponse.  Values msgpack can not
+    serialise are passed to the encoder's `default`.  As MessagePack is not
+    vulnerable to the same attack as JSON arrays, `safe` is ignored.
+    '''
+
+    def __init__(self, data, encoder=NapJSONEncoder, safe=True,
+                 json_dumps_params=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/msgpack')
+        data = get_format('application/msgpack').dumps(data, encoder)
+        super().__init__(content=data, **kwargs)
+
+
+# Response classes for the binary formats in nap.utils.formats
+RESPONSE_CLASSES = {
+    'application/msgpack': MsgpackResponse,
+    'application/x-msgpack': MsgpackResponse,
+}
+
 
 # Near verbatim copy of JsonResponse, with the following changes:
 # 1. Uses StreamingJSONResponse
 # 2. Calls JsonEncoder().iterencode
 # 3. Uses NapJSONEncoder
+# 4. Joins the encoded output into chunks of at least chunk_size characters
 
 
 class StreamingJSONResponse(StreamingHttpResponse):
@@ -20,10 +70,11 @@ class StreamingJSONResponse(StreamingHttpResponse):
     :param safe: Controls if only ``dict`` objects may be serialized. Defaults
       to ``True``.
     :param json_dumps_params: A dictionary of kwargs passed to json.dumps().
+    :param chunk_size: The minimum size of each chunk of encoded output.
     """
 
     def __init__(self, data, encoder=NapJSONEncoder, safe=True,
-                 json_dumps_params=None, **kwargs):
+                 json_dumps_params=None, chunk_size=8192, **kwargs):
         if safe and not isinstance(data, dict):
             raise TypeError(
                 'In order to allow non-dict objects to be serialized set the '
@@ -32,5 +83,22 @@ class StreamingJSONResponse(StreamingHttpResponse):
         if json_dumps_params is None:
             json_dumps_params = {}
         kwargs.setdefault('content_type', 'application/json')
-        data = encoder().iterencode(data)
-        super().__init__(streaming_content=data, **kwargs)
+        data = encoder(**json_dumps_params).iterencode(data)
+        super().__init__(streaming_content=join_chunks(data, chunk_size), **kwargs)
+
+
+def join_chunks(iterable, size):
+    '''
+    Join the strings from iterable into chunks of at least size characters.
+    '''
+    buf = []
+    length = 0
+    for chunk in iterable:
+        buf.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buf)
+            buf = []
+            length = 0
+    if buf:
+        yield ''.join(buf)
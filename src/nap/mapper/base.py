@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from django.db.models.fields import NOT_PROVIDED
 from django.forms.utils import ErrorDict, ErrorList
 
+from .compiler import COMPILERS
 from .fields import field
 from .utils import DictObject
 
@@ -22,6 +23,9 @@ class MetaMapper(type):
 
         new_class._fields = fields
         new_class._field_names = tuple(fields.keys())
+        # Each class has its own cache of compiled functions, filled on first
+        # use by _get_compiled.
+        new_class._compiled = {}
 
         return new_class
 
@@ -33,6 +37,9 @@ class Mapper(metaclass=MetaMapper):
     Provides a proxy class for retrieving and updating attributes on your
     objects.
     '''
+    # Use a reduce function generated specifically for this class.
+    _compile_reduce = True
+
     def __init__(self, obj=None, **kwargs):
         '''
         :param: obj Optionally bind to object
@@ -67,11 +74,75 @@ class Mapper(metaclass=MetaMapper):
 
         Returns a dict.
         '''
+        if self._compile_reduce:
+            return self._get_compiled('reduce')(self)
         return {
             name: getattr(self, name)
             for name in self._field_names
         }
 
+    @classmethod
+    def _reduce_many(cls, iterable, **kwargs):
+        '''
+        Reduce each object in iterable.
+
+        Returns a list of dicts, as ``mapper << obj`` would for each.
+
+        :param: **kwargs Extra context, as for __init__
+        '''
+        return cls._bulk_reduce('reduce_many', iterable, kwargs)
+
+    @classmethod
+    def _iter_reduce(cls, iterable, **kwargs):
+        '''
+        Generator version of _reduce_many.
+        '''
+        return cls._bulk_reduce('reduce_iter', iterable, kwargs)
+
+    @classmethod
+    def _reduce_rows(cls, iterable, **kwargs):
+        '''
+        Reduce each object in iterable to a list of its field values, in the
+        order of ``_field_names``.
+
+        Returns a list of lists.
+        '''
+        return cls._bulk_reduce('reduce_rows', iterable, kwargs)
+
+    @classmethod
+    def _iter_rows(cls, iterable, **kwargs):
+        '''
+        Generator version of _reduce_rows.
+        '''
+        return cls._bulk_reduce('iter_rows', iterable, kwargs)
+
+    @classmethod
+    def _bulk_reduce(cls, kind, iterable, context):
+        mapper = cls(**context)
+        if cls._compile_reduce and cls._reduce is Mapper._reduce:
+            return cls._get_compiled(kind)(mapper, iterable)
+
+        # Fall back to reducing each object in turn.
+        data = (mapper << obj for obj in iterable)
+        if kind in ('reduce_rows', 'iter_rows'):
+            names = cls._field_names
+            data = ([row[name] for name in names] for row in data)
+        if kind in ('reduce_many', 'reduce_rows'):
+            data = list(data)
+        return data
+
+    @classmethod
+    def _get_compiled(cls, kind):
+        '''
+        Return the compiled function of this kind for this class, building it
+        on first use.
+        '''
+        try:
+            return cls._compiled[kind]
+        except KeyError:
+            func = cls._compiled[kind] = COMPILERS[kind](cls)
+            return func
+
     def _clean(self, data, full=True):
         '''
         Hook for finall pass validation.
@@ -81,12 +152,20 @@ class Mapper(metaclass=MetaMapper):
         '''
         return
 
+    def _snapshot(self):
+        '''
+        Hook to record the state of the object before it is updated, so
+        changes can be found.  Stored as self._initial by _patch and _apply.
+        '''
+        return None
+
     def _patch(self, data):
         '''
         Update an instance from supplied data.
         '''
 
         self._errors = errors = ErrorDict()
+        self._initial = self._snapshot()
 
         for name in self._field_names:
             if self._fields[name].readonly:
@@ -118,6 +197,7 @@ class Mapper(metaclass=MetaMapper):
         All fields omitted will have their default used, if provided.
         '''
         self._errors = errors = ErrorDict()
+        self._initial = self._snapshot()
 
         for name in self._field_names:
             if self._fields[name].readonly:
@@ -0,0 +1,183 @@
+'''
+Generate specialised reduce functions for Mapper classes.
+
+Rather than resolving each field through the descriptor protocol for every
+object, we inspect the fields once and build a flat function which reads the
+values directly.
+'''
+from functools import partial
+
+from .fields import Field, context_field, field
+
+
+def field_getters(cls):
+    '''
+    Yield (name, kind, args) for each field on the Mapper class.
+
+    kind is one of:
+    - 'attr': a plain Field; read ``getattr(obj, attr, default)``
+    - 'get': a Field with a getter; args are (attr, default, get, null)
+    - 'fget': a field; call ``fget(obj)``
+    - 'context': a context_field; call ``fget(obj, context)``
+    - 'mapper': anything else; fall back to ``getattr(mapper, name)``
+    '''
+    for name in cls._field_names:
+        prop = cls._fields[name]
+        kind = type(prop)
+        if isinstance(prop, Field) and kind.__get__ is Field.__get__:
+            if kind.get is Field.get:
+                yield name, 'attr', (prop.attr, prop.default)
+            else:
+                yield name, 'get', (prop.attr, prop.default, prop.get, prop.null)
+        elif kind.__get__ is context_field.__get__:
+            yield name, 'context', (prop.fget,)
+        elif kind.__get__ is field.__get__:
+            yield name, 'fget', (prop.fget,)
+        else:
+            yield name, 'mapper', ()
+
+
+def build_source(cls, namespace, values=False):
+    '''
+    Build the source lines to compute every field value for ``obj``.
+
+    Returns (lines, exprs, bound) where lines is a list of statements to run
+    first, exprs is a list of expressions yielding each field's value, in
+    ``_field_names`` order, and bound indicates if any expression needs
+    ``mapper`` bound to ``obj``.
+
+    If values is True, each field's raw value is instead taken from a local
+    named ``r<index>``.  Only fields which read an attribute are permitted.
+
+    Any values the code refers to are added to ``namespace``.
+    '''
+    lines = []
+    exprs = []
+    bound = False
+    for idx, (name, kind, args) in enumerate(field_getters(cls)):
+        if values and kind not in ('attr', 'get'):
+            raise ValueError('Field %r can not be reduced from values.' % name)
+        if kind == 'attr':
+            attr, namespace['d%d' % idx] = args
+            if values:
+                exprs.append('r%d' % idx)
+            else:
+                exprs.append('getattr(obj, %r, d%d)' % (attr, idx))
+        elif kind == 'get':
+            attr, namespace['d%d' % idx], namespace['g%d' % idx], null = args
+            if values:
+                value = 'r%d' % idx
+            else:
+                value = 'getattr(obj, %r, d%d)' % (attr, idx)
+            if null:
+                lines.append('v%d = %s' % (idx, value))
+                lines.append('if v%d is not None: v%d = g%d(v%d)' % (idx, idx, idx, idx))
+                exprs.append('v%d' % idx)
+            else:
+                exprs.append('g%d(%s)' % (idx, value))
+        elif kind == 'fget':
+            namespace['f%d' % idx] = args[0]
+            exprs.append('f%d(obj)' % idx)
+        elif kind == 'context':
+            namespace['f%d' % idx] = args[0]
+            exprs.append('f%d(obj, context)' % idx)
+        else:
+            exprs.append('getattr(mapper, %r)' % name)
+            bound = True
+    return lines, exprs, bound
+
+
+def compile_function(source, namespace, name):
+    '''Execute the source in namespace, and return the function it defines.'''
+    code = compile(source, '<nap.mapper.compiler %s>' % name, 'exec')
+    exec(code, namespace)
+    return namespace[name]
+
+
+def indent(lines, depth):
+    prefix = '    ' * depth
+    return ''.join(prefix + line + '\n' for line in lines)
+
+
+def dict_items(cls, exprs):
+    return [
+        '%r: %s,' % (name, expr)
+        for name, expr in zip(cls._field_names, exprs)
+    ]
+
+
+def compile_reducer(cls):
+    '''
+    Returns a function which, given a Mapper instance, returns the same dict
+    as ``Mapper._reduce``.
+    '''
+    namespace = {}
+    lines, exprs, bound = build_source(cls, namespace)
+    source = (
+        'def reduce(mapper):\n'
+        '    obj = mapper._obj\n'
+        '    context = mapper._context\n' +
+        indent(lines, 1) +
+        '    return {\n' +
+        indent(dict_items(cls, exprs), 2) +
+        '    }\n'
+    )
+    return compile_function(source, namespace, 'reduce')
+
+
+def compile_loop(cls, name, rows=False, lazy=False, values=False):
+    '''
+    Returns a function which, given a Mapper instance and an iterable of
+    objects, reduces each of them.
+
+    If values is True, the iterable yields tuples of raw field values in
+    ``_field_names`` order, as from ``QuerySet.values_list``, instead of
+    objects.
+
+    If rows is True, each object is reduced to a list of values in
+    ``_field_names`` order, instead of a dict.
+
+    If lazy is True, the function is a generator. Otherwise it returns a list.
+    '''
+    namespace = {}
+    lines, exprs, bound = build_source(cls, namespace, values=values)
+    if values:
+        target = ''.join('r%d, ' % idx for idx in range(len(exprs)))
+    else:
+        target = 'obj'
+    if rows:
+        items = [expr + ',' for expr in exprs]
+        start, end = '[', ']'
+    else:
+        items = dict_items(cls, exprs)
+        start, end = '{', '}'
+    if lazy:
+        emit = 'yield ' + start
+    else:
+        emit, end = 'append(' + start, end + ')'
+    source = (
+        'def %s(mapper, iterable):\n' % name +
+        '    context = mapper._context\n' +
+        ('' if lazy else '    result = []\n    append = result.append\n') +
+        '    for %s in iterable:\n' % target +
+        ('        mapper._obj = obj\n' if bound else '') +
+        indent(lines, 2) +
+        '        %s\n' % emit +
+        indent(items, 3) +
+        '        %s\n' % end +
+        ('' if lazy else '    return result\n')
+    )
+    return compile_function(source, namespace, name)
+
+
+COMPILERS = {
+    'reduce': compile_reducer,
+    'reduce_many': partial(compile_loop, name='reduce_many'),
+    'reduce_iter': partial(compile_loop, name='reduce_iter', lazy=True),
+    'reduce_rows': partial(compile_loop, name='reduce_rows', rows=True),
+    'iter_rows': partial(compile_loop, name='iter_rows', rows=True, lazy=True),
+    'values_many': partial(compile_loop, name='values_many', values=True),
+    'values_rows': partial(compile_loop, name='values_rows', rows=True, values=True),
+    'values_iter': partial(compile_loop, name='values_iter', lazy=True, values=True),
+    'values_iter_rows': partial(compile_loop, name='values_iter_rows', rows=True, lazy=True, values=True),
+}
@@ -20,6 +20,8 @@ class field(property):
         self.default = kwargs.pop('default', NOT_PROVIDED)
         self.readonly = kwargs.pop('readonly', fset is None)
         self.null = kwargs.pop('null', False)
+        # Model columns the getter reads, for restricting queries.
+        self.columns = kwargs.pop('columns', None)
         super().__init__(fget, fset, fdel, doc)
 
     def __get__(self, instance, cls=None):
@@ -32,6 +34,12 @@ class field(property):
             raise AttributeError("can't set attribute")
         self.fset(instance._obj, value)
 
+    def __copy__(self):
+        clone = property.__new__(type(self))
+        property.__init__(clone, self.fget, self.fset, self.fdel)
+        clone.__dict__.update(self.__dict__)
+        return clone
+
     def setter(self, func):
         kwargs = self.__dict__.copy()
         kwargs.pop('__doc__')
@@ -1,10 +1,19 @@
-from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.db.models import Manager
+from copy import copy
+from hashlib import md5
+from weakref import WeakSet
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist, ValidationError
+from django.db import router, transaction
+from django.db.models import Field as ModelField, ForeignObjectRel, Manager
 from django.db.models.fields import NOT_PROVIDED
+from django.db.models.signals import post_delete, post_save
+from django.forms.utils import ErrorList
 
 from . import fields
 from .base import Mapper, MetaMapper as BaseMetaMapper
+from .compiler import field_getters
 
 
 class Options:
@@ -17,6 +26,61 @@ class Options:
         self.exclude = set(getattr(meta, 'exclude', []))
         self.required = getattr(meta, 'required', {})
         self.readonly = set(getattr(meta, 'readonly', []))
+        self.version = getattr(meta, 'version', None)
+        self.cache = getattr(meta, 'cache', None)
+        self.cache_timeout = getattr(meta, 'cache_timeout', DEFAULT_TIMEOUT)
+
+
+# Mappers with a reduce cache, by model.
+CACHED_MAPPERS = {}
+
+
+def invalidate_reduce_cache(sender, instance, using=None, **kwargs):
+    '''
+    Remove the cached reduced forms of instance, for each of its mappers.
+
+    If a transaction is open, this is deferred until it commits, so a
+    concurrent read can not cache the old data again, and nothing is removed
+    if it rolls back.
+    '''
+    deletes = [
+        (caches[mapper._meta.cache], mapper._cache_key(instance))
+        for mapper in CACHED_MAPPERS.get(sender, ())
+    ]
+    if not deletes:
+        return
+
+    def delete():
+        for cache, key in deletes:
+            cache.delete(key)
+    transaction.on_commit(delete, using=using)
+
+
+def invalidate_reduce_cache_many(model, objs, using=None):
+    '''
+    Remove the cached reduced forms of objs, for each mapper of model.
+
+    Call this for changes which send no signals, such as ``bulk_update``.
+    objs is only evaluated if model has a cached mapper.
+
+    As for invalidate_reduce_cache, this is deferred until any open
+    transaction on the database using commits.
+    '''
+    mappers = list(CACHED_MAPPERS.get(model, ()))
+    if not mappers:
+        return
+    objs = list(objs)
+    deletes = [
+        (caches[mapper._meta.cache], [mapper._cache_key(obj) for obj in objs])
+        for mapper in mappers
+    ]
+
+    def delete():
+        for cache, keys in deletes:
+            cache.delete_many(keys)
+    if using is None:
+        using = router.db_for_write(model)
+    transaction.on_commit(delete, using=using)
 
 
 class MetaMapper(BaseMetaMapper):
@@ -85,10 +149,40 @@ class MetaMapper(BaseMetaMapper):
                 setattr(cls, f.name, field)
                 cls._fields[f.name] = field
 
+            # ToOneFields with no mapper only need the related PK, so read it
+            # from the local column instead of loading the related object.
+            for name, field in list(cls._fields.items()):
+                if not isinstance(field, ToOneField) or field.mapper or field.id_only:
+                    continue
+                try:
+                    f = meta.model._meta.get_field(field.attr)
+                except FieldDoesNotExist:
+                    continue
+                if not f.concrete or not (f.many_to_one or f.one_to_one):
+                    continue
+                # With to_field, the local column does not hold the PK.
+                if f.target_field != f.related_model._meta.pk:
+                    continue
+                # Don't alter a field shared with the class body or a parent.
+                field = copy(field)
+                field.attr = f.attname
+                field.id_only = True
+                setattr(cls, name, field)
+                cls._fields[name] = field
+
         cls._field_names = tuple(cls._fields)
 
         setattr(cls, '_meta', meta)
 
+        if meta.model is not None and meta.cache is not None:
+            # Only changes to the object itself invalidate the cache.
+            for name, field in cls._fields.items():
+                if isinstance(field, ToManyField) or isinstance(field, ToOneField) and not field.id_only:
+                    raise ValueError('Meta.cache can not be used with related field %r.' % name)
+            CACHED_MAPPERS.setdefault(meta.model, WeakSet()).add(cls)
+            post_save.connect(invalidate_reduce_cache, sender=meta.model, dispatch_uid='nap.reduce_cache')
+            post_delete.connect(invalidate_reduce_cache, sender=meta.model, dispatch_uid='nap.reduce_cache')
+
         return cls
 
 
@@ -108,12 +202,338 @@ class ModelMapper(Mapper, metaclass=MetaMapper):
         self.obj = self._meta.model()
         return self._apply(other)
 
+    @classmethod
+    def _query_plan(cls, prefix=''):
+        '''
+        Returns a tuple of (select_related, prefetch_related) lookups needed
+        to reduce instances of our model without extra queries.
+
+        ToOneFields with a mapper are followed with select_related, and all
+        ToManyFields with prefetch_related.  Nested ModelMappers are included.
+
+        Fields whose attr is not a relation on the model, such as properties,
+        are skipped.
+        '''
+        opts = cls._meta.model._meta
+        select, prefetch = [], []
+        for name in cls._field_names:
+            field = cls._fields[name]
+            if isinstance(field, ToOneField):
+                if not field.mapper:
+                    continue
+                f = get_relation(opts, field.attr)
+                # Only forward ForeignKeys and either side of a OneToOneField
+                # can be followed by select_related.
+                if f is None or not (f.one_to_one or f.many_to_one and f.concrete):
+                    continue
+                path = prefix + field.attr
+                select.append(path)
+            elif isinstance(field, ToManyField):
+                if get_relation(opts, field.attr) is None:
+                    continue
+                path = prefix + field.attr
+                prefetch.append(path)
+            else:
+                continue
+            try:
+                plan = field.mapper._query_plan
+            except AttributeError:
+                continue
+            sub_select, sub_prefetch = plan(path + '__')
+            if isinstance(field, ToOneField):
+                select.extend(sub_select)
+            else:
+                prefetch.extend(sub_select)
+            prefetch.extend(sub_prefetch)
+        return select, prefetch
+
+    @classmethod
+    def _query_columns(cls, prefix=''):
+        '''
+        Returns a list of the model fields read when reducing, suitable for
+        passing to QuerySet.only(), or None if they can not be determined.
+
+        Fields which do not map directly to a model field must declare the
+        columns they read using ``columns=[...]``.
+
+        With ``Meta.cache``, the ``Meta.version`` field is included, as it is
+        read to build the cache key.
+        '''
+        opts = cls._meta.model._meta
+        columns = []
+        version = cls._meta.version
+        if cls._meta.cache is not None and version:
+            try:
+                f = opts.get_field(version)
+            except FieldDoesNotExist:
+                return None
+            if not f.concrete:
+                return None
+            columns.append(prefix + f.name)
+        for name in cls._field_names:
+            field = cls._fields[name]
+            if field.columns is not None:
+                columns.extend(prefix + column for column in field.columns)
+                continue
+            if isinstance(field, ToManyField):
+                # Prefetched separately.
+                continue
+            if not isinstance(field, fields.Field):
+                return None
+            try:
+                f = opts.get_field(field.attr)
+            except FieldDoesNotExist:
+                return None
+            if not f.concrete:
+                return None
+            columns.append(prefix + f.name)
+            if isinstance(field, ToOneField) and field.mapper:
+                try:
+                    sub_columns = field.mapper._query_columns(prefix + f.name + '__')
+                except AttributeError:
+                    sub_columns = None
+                if sub_columns is not None:
+                    columns.extend(sub_columns)
+        return columns
+
+    @classmethod
+    def _values_columns(cls):
+        '''
+        Returns the list of model columns to pass to QuerySet.values_list()
+        to reduce without constructing model instances, or None if any field
+        does more than convert a single column's value.
+        '''
+        if not cls._field_names:
+            return None
+        if not cls._compile_reduce or cls._reduce is not Mapper._reduce:
+            return None
+        opts = cls._meta.model._meta
+        columns = []
+        for name, kind, args in field_getters(cls):
+            if kind not in ('attr', 'get') or isinstance(cls._fields[name], ToManyField):
+                return None
+            attr = args[0]
+            try:
+                f = opts.get_field(attr)
+            except FieldDoesNotExist:
+                return None
+            if not f.concrete or f.attname != attr:
+                return None
+            # For relations, only the local FK column gives the same value.
+            if f.is_relation and (f.many_to_many or attr == f.name):
+                return None
+            columns.append(attr)
+        return columns
+
+    @classmethod
+    def _reduce_values(cls, queryset, rows=False, chunk_size=None):
+        '''
+        Reduce each record in queryset, using values_list() instead of model
+        instances.  Returns the same as _reduce_many, or _reduce_rows if rows
+        is True.
+
+        If chunk_size is given, returns a generator which fetches records
+        using QuerySet.iterator(chunk_size).
+
+        Only valid if _values_columns() does not return None.
+        '''
+        columns = cls._values_columns()
+        values = queryset.values_list(*columns)
+        kind = 'values_rows' if rows else 'values_many'
+        if chunk_size:
+            values = values.iterator(chunk_size=chunk_size)
+            kind = 'values_iter_rows' if rows else 'values_iter'
+        return cls._get_compiled(kind)(cls(), values)
+
+    @classmethod
+    def _cache_key(cls, obj):
+        '''
+        Returns the key to cache the reduced form of obj under.
+
+        Built from the mapper class, obj's PK, and the value of the
+        ``Meta.version`` field, if set.
+        '''
+        version = cls._meta.version
+        token = (obj.pk, getattr(obj, version) if version else None)
+        return 'nap:reduce:%s.%s:%s' % (
+            cls.__module__, cls.__qualname__, md5(repr(token).encode('utf-8')).hexdigest(),
+        )
+
+    @classmethod
+    def _reduce_cached(cls, iterable, **context):
+        '''
+        Returns the same as _reduce_many, but reuses the reduced form of each
+        object from the cache named by ``Meta.cache``.
+
+        Only objects missing from the cache are reduced, and then stored.
+
+        If there is no cache configured, or any context is passed, simply
+        calls _reduce_many.
+        '''
+        if cls._meta.cache is None or context:
+            return cls._reduce_many(iterable, **context)
+        cache = caches[cls._meta.cache]
+        objs = list(iterable)
+        keys = [cls._cache_key(obj) for obj in objs]
+        found = cache.get_many(keys)
+        missing = {
+            key: obj
+            for key, obj in zip(keys, objs)
+            if key not in found
+        }
+        if missing:
+            reduced = dict(zip(missing, cls._reduce_many(missing.values())))
+            cache.set_many(reduced, cls._meta.cache_timeout)
+            found.update(reduced)
+        return [found[key] for key in keys]
+
+    @classmethod
+    def _related_resolver(cls, rows):
+        '''
+        Returns a RelatedResolver for the ToOneFields and ToManyFields without
+        mappers, with all records referenced by rows fetched.
+        '''
+        opts = cls._meta.model._meta
+        related = {}
+        for name in cls._field_names:
+            field = cls._fields[name]
+            if not isinstance(field, (ToOneField, ToManyField)) or field.mapper or field.readonly:
+                continue
+            try:
+                f = opts.get_field(field.attr)
+            except FieldDoesNotExist:
+                continue
+            if f.is_relation and f.concrete:
+                related[name] = (field, f)
+        resolver = RelatedResolver()
+        resolver.fetch(related, rows)
+        return resolver
+
+    def _snapshot(self):
+        '''
+        Returns a dict of the values of the object's concrete fields, by name.
+
+        Deferred fields are omitted, to avoid loading them.
+        '''
+        obj = self._obj
+        deferred = obj.get_deferred_fields()
+        return {
+            f.name: getattr(obj, f.attname)
+            for f in obj._meta.concrete_fields
+            if f.attname not in deferred
+        }
+
+    def _changed_fields(self):
+        '''
+        Returns a list of the names of model fields whose values have changed
+        since the last _patch or _apply began, suitable for passing to
+        ``save(update_fields=...)``.
+
+        Returns None if all fields must be saved: the object has not been
+        saved before, its PK has changed, or there is no snapshot.
+        '''
+        initial = getattr(self, '_initial', None)
+        obj = self._obj
+        if initial is None or obj._state.adding:
+            return None
+        current = self._snapshot()
+        changed = [
+            name
+            for name, value in current.items()
+            if name not in initial or value != initial[name]
+        ]
+        if obj._meta.pk.name in changed:
+            return None
+        return changed
+
     def _clean(self, data, full=True):
+        '''
+        Validate the object using the model's ``full_clean``.
+
+        For a _patch, only fields which were submitted are validated, and
+        unique checks are only run for fields which changed.
+
+        For fields resolved by a RelatedResolver, the related record is not
+        looked up again, but all other checks are run.
+        '''
+        obj = self._obj
+        opts = obj._meta
+        exclude = self._meta.exclude
+        submitted = None if full else self._submitted_fields(data)
+        names = {f.name for f in opts.fields}
+        skip = exclude if submitted is None else exclude | (names - submitted)
+        resolved = set()
+        resolver = getattr(self, '_resolver', None)
+        if resolver is not None:
+            resolved = {
+                opts.get_field(field.attr).name
+                for field in self._fields.values()
+                if isinstance(field, ToOneField) and field in resolver.models
+            } - skip
         try:
-            self._obj.full_clean(exclude=self._meta.exclude)
+            obj.full_clean(exclude=skip | resolved, validate_unique=False)
         except ValidationError as e:
             for k, v in e.message_dict.items():
-                self._errors.setdefault(k, []).extend(v)
+                self._errors.setdefault(k, ErrorList()).extend(v)
+        for name in resolved:
+            # Skip ForeignKey.validate, which checks the record exists.
+            f = opts.get_field(name)
+            value = getattr(obj, f.attname)
+            try:
+                ModelField.validate(f, value, obj)
+                f.run_validators(value)
+            except ValidationError as e:
+                self._errors.setdefault(name, ErrorList()).extend(e.messages)
+
+        if submitted is not None:
+            unique = self._unique_fields(exclude)
+            if not unique:
+                return
+            exclude = exclude | (names - unique)
+        try:
+            obj.validate_unique(exclude=exclude | set(self._errors))
+        except ValidationError as e:
+            for k, v in e.message_dict.items():
+                self._errors.setdefault(k, ErrorList()).extend(v)
+
+    def _submitted_fields(self, data):
+        '''
+        Returns the set of model field names set from data, or None if any
+        can not be determined.
+        '''
+        opts = self._obj._meta
+        names = set()
+        for name in self._field_names:
+            prop = self._fields[name]
+            if prop.readonly or name not in data:
+                continue
+            if not isinstance(prop, fields.Field):
+                return None
+            try:
+                names.add(opts.get_field(prop.attr).name)
+            except FieldDoesNotExist:
+                return None
+        return names
+
+    def _unique_fields(self, exclude):
+        '''
+        Returns the set of model field names in unique checks involving a
+        changed field.
+        '''
+        changed = self._changed_fields()
+        if changed is not None:
+            changed = set(changed)
+        unique_checks, date_checks = self._obj._get_unique_checks(exclude=exclude)
+        checks = [check for model, check in unique_checks]
+        checks.extend(
+            (field, unique_for)
+            for model, lookup, field, unique_for in date_checks
+        )
+        result = set()
+        for check in checks:
+            if changed is None or not changed.isdisjoint(check):
+                result.update(check)
+        return result
 
 
 class RelatedField(fields.Field):
@@ -126,18 +546,38 @@ class RelatedField(fields.Field):
 
 
 class ToOneField(RelatedField):
+    # Set by ModelMapper when attr is the local PK column of the relation.
+    id_only = False
 
     def get(self, value):
         if self.mapper:
             return self.mapper(value)._reduce()
-        if value is None:
+        if value is None or self.id_only:
             return value
         return value.pk
 
     def set(self, value):
         if self.mapper:
             return self.mapper() << value
-        return self.related_model.objects.get(pk=value)
+        queryset = self.related_model._default_manager.filter(pk=value)
+        if self.id_only:
+            # We only need to know it exists.
+            queryset = queryset.values_list('pk', flat=True)
+        try:
+            return queryset.get()
+        except ObjectDoesNotExist:
+            raise ValidationError('Invalid pk: %r' % (value,))
+
+    def __set__(self, instance, value):
+        resolver = getattr(instance, '_resolver', None)
+        if resolver is None or self.mapper or value is None or self not in resolver.models:
+            return super().__set__(instance, value)
+        if self.readonly:
+            raise AttributeError('Field is read-only.')
+        obj = resolver.get(self, value)
+        if self.id_only:
+            obj = getattr(obj, 'pk', obj)
+        setattr(instance._obj, self.attr, obj)
 
 
 class ToManyField(RelatedField):
@@ -146,8 +586,7 @@ class ToManyField(RelatedField):
         if isinstance(value, Manager):
             value = value.all()
         if self.mapper:
-            m = self.mapper()
-            return [m << obj for obj in iter(value)]
+            return self.mapper._reduce_many(value)
         return [obj.pk for obj in iter(value)]
 
     def __set__(self, instance, value):
@@ -158,8 +597,117 @@ class ToManyField(RelatedField):
                 raise ValueError('Field may not be None')
         else:
             value = self.set(value)
-        with transaction.atomic():
-            getattr(instance._obj, self.attr).set(value)
+        resolver = getattr(instance, '_resolver', None)
+        if resolver is None or value is None or self not in resolver.models:
+            with transaction.atomic():
+                getattr(instance._obj, self.attr).set(value)
+            return
+        # The caller is responsible for the transaction.
+        value = [resolver.get(self, item) for item in value]
+        value = [getattr(item, 'pk', item) for item in value]
+        getattr(instance._obj, self.attr).set(value)
+
+
+class RelatedResolver:
+    '''
+    Resolves the values for ToOneFields and ToManyFields from records fetched
+    with one query for each related model, instead of one for each value.
+
+    Records are fetched using the related model's default manager, as
+    ToOneField.set does.  ForeignKeys with ``limit_choices_to`` are fetched
+    separately, with the limit applied.
+
+    Assign it to a mapper as ``mapper._resolver`` before calling _patch or
+    _apply.
+    '''
+    def __init__(self):
+        # field: related model
+        self.models = {}
+        # field: key into records; the model, or the field if it is limited
+        self.keys = {}
+        # key: {pk: object, or pk if only existence was checked}
+        self.records = {}
+
+    def fetch(self, fields, rows):
+        '''
+        Fetch the records referenced by fields in each of rows.
+
+        fields is a dict of {name: (field, model field)}, and rows a list of
+        data dicts.
+        '''
+        wanted = {}
+        need_objects = set()
+        limits = {}
+        for name, (field, model_field) in fields.items():
+            model = model_field.related_model
+            key = model
+            if not isinstance(field, ToManyField):
+                limit = model_field.get_limit_choices_to()
+                if limit:
+                    key = field
+                    limits[key] = limit
+            self.models[field] = model
+            self.keys[field] = key
+            values = wanted.setdefault(key, (model, set()))[1]
+            if not getattr(field, 'id_only', True):
+                need_objects.add(key)
+            for row in rows:
+                if not isinstance(row, dict) or row.get(name) is None:
+                    continue
+                value = row[name]
+                items = value if isinstance(field, ToManyField) else [value]
+                values.update(to_pk(model, item) for item in items)
+
+        for key, (model, values) in wanted.items():
+            values.discard(None)
+            queryset = model._default_manager.all()
+            if key in limits:
+                queryset = queryset.complex_filter(limits[key])
+            if key in need_objects:
+                self.records[key] = queryset.in_bulk(values)
+            else:
+                self.records[key] = {
+                    value: value
+                    for value in queryset.filter(pk__in=values).values_list('pk', flat=True)
+                }
+
+    def get(self, field, value):
+        model = self.models[field]
+        try:
+            return self.records[self.keys[field]][to_pk(model, value)]
+        except KeyError:
+            raise ValidationError('Invalid pk: %r' % (value,))
+
+
+def get_relation(opts, attr):
+    '''
+    Returns the relation on the model with options opts accessed as attr, or
+    None if attr is not a relation.
+
+    Reverse relations are found by their accessor name, such as ``choice_set``.
+    '''
+    try:
+        f = opts.get_field(attr)
+    except FieldDoesNotExist:
+        pass
+    else:
+        if not f.is_relation:
+            return None
+        # get_field finds reverse relations by their query name.
+        if not isinstance(f, ForeignObjectRel) or f.get_accessor_name() == attr:
+            return f
+    for f in opts.related_objects:
+        if f.get_accessor_name() == attr:
+            return f
+    return None
+
+
+def to_pk(model, value):
+    '''Convert value for model's PK field, or None if it is not valid.'''
+    try:
+        return model._meta.pk.to_python(value)
+    except (ValidationError, TypeError):
+        return None
 
 
 FIELD_MAP = {
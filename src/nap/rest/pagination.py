@@ -0,0 +1,223 @@
+'''
+Pagination which avoids the cost of counting, or skipping, records.
+'''
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from hashlib import md5
+
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+
+def count_capped(queryset, limit):
+    '''
+    Count the records in queryset, stopping after limit + 1.
+    '''
+    return queryset[:limit + 1].count()
+
+
+def count_cached(queryset, cache, timeout):
+    '''
+    Count the records in queryset, caching the result for timeout seconds,
+    keyed by the SQL of the query.
+
+    A query which can match nothing, such as ``filter(pk__in=[])``, has no
+    SQL, so is not run or cached.
+    '''
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    key = 'nap:count:%s' % md5(repr((queryset.db, sql, params)).encode('utf-8')).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class UncountedPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.paginator.per_page * (self.number - 1)) + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+
+class UncountedPaginator(Paginator):
+    '''
+    A Paginator which doesn't count the records to select a page.
+
+    Instead it fetches one more record than it needs, to see if there is a
+    next page.
+    '''
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not object_list and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage(_('That page contains no results'))
+        has_next = len(object_list) > self.per_page
+        return UncountedPage(object_list[:self.per_page], number, self, has_next)
+
+
+# Keyset (cursor) pagination.
+#
+# Instead of using OFFSET, each page is selected by filtering for records which
+# sort after (or before) the last record of the previous page.  This avoids
+# counting and skipping records, so every page costs the same to fetch.
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, reverse=False):
+    data = json.dumps([reverse, values], separators=(',', ':'))
+    return urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    '''
+    Returns (values, reverse) from an encoded cursor.
+    '''
+    try:
+        reverse, values = json.loads(urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (BinasciiError, UnicodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values, bool(reverse)
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    '''
+    Paginate a QuerySet by the values of ``ordering``.
+
+    The ordering must be unique across the queryset, and its fields must not
+    be null.  Prefix a field name with '-' to sort descending.  Only fields
+    of the queryset's model may be used, not related lookups.
+    '''
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = list(ordering)
+        opts = queryset.model._meta
+        self.fields = []
+        for name in (name.lstrip('-') for name in self.ordering):
+            try:
+                field = opts.pk if name == 'pk' else opts.get_field(name)
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete:
+                raise ImproperlyConfigured(
+                    'Cursor pagination can only order by fields of %s, not %r.' % (opts.label, name)
+                )
+            self.fields.append(field)
+        self.descending = [name.startswith('-') for name in self.ordering]
+
+    def get_values(self, obj):
+        '''Returns the cursor values for obj.'''
+        return [field.value_to_string(obj) for field in self.fields]
+
+    def filter_after(self, values, reverse):
+        '''
+        Returns a Q matching records which sort after values, or before if
+        reverse is True.
+        '''
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        query = Q()
+        for idx, field in enumerate(self.fields):
+            term = Q(**{
+                prev.name: value
+                for prev, value in zip(self.fields[:idx], values)
+            })
+            lookup = 'lt' if self.descending[idx] != reverse else 'gt'
+            term &= Q(**{'%s__%s' % (field.name, lookup): values[idx]})
+            query |= term
+        return query
+
+    def page(self, cursor=None):
+        '''
+        Returns the CursorPage following the given cursor, or the first page
+        if cursor is None.
+        '''
+        if cursor:
+            values, reverse = decode_cursor(cursor)
+        else:
+            values, reverse = None, False
+
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else '-' + name
+                for name in self.ordering
+            ]
+        else:
+            ordering = self.ordering
+        queryset = self.queryset
+        try:
+            if values is not None:
+                queryset = queryset.filter(self.filter_after(values, reverse))
+            object_list = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        except (ValidationError, ValueError, TypeError):
+            # Bad values in the cursor may fail conversion.
+            raise InvalidCursor(cursor)
+
+        more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if reverse:
+            object_list.reverse()
+            has_next, has_prev = values is not None, more
+        else:
+            has_next, has_prev = more, values is not None
+
+        next_cursor = prev_cursor = None
+        if object_list:
+            if has_next:
+                next_cursor = encode_cursor(self.get_values(object_list[-1]))
+            if has_prev:
+                prev_cursor = encode_cursor(self.get_values(object_list[0]), reverse=True)
+        return CursorPage(object_list, next_cursor, prev_cursor)
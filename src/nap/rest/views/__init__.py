@@ -1,3 +1,4 @@
 from .base import NapView  # NOQA
-from .list import ListMixin, ListGetMixin, ListPostMixin, ListPostMixin, ListBaseView  # NOQA
+from .list import ListMixin, ListGetMixin, ListPostMixin, ListPatchMixin, ListDeleteMixin, ListBaseView  # NOQA
 from .object import ObjectMixin, ObjectGetMixin, ObjectPutMixin, ObjectPatchMixin, ObjectDeleteMixin, ObjectBaseView  # NOQA
+from .cache import ResponseCacheMixin  # NOQA
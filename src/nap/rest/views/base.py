@@ -1,7 +1,16 @@
+import datetime
+from calendar import timegm
+from hashlib import md5
+from itertools import islice
+
+from django.db.models import QuerySet, prefetch_related_objects
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 from django.views.generic import View
 
 from nap import http
 from nap.http.decorators import except_response
+from nap.http.response import RESPONSE_CLASSES, JsonResponse, StreamingJSONResponse
 from nap.utils import JsonMixin
 
 
@@ -25,10 +34,17 @@ class MapperMixin(JsonMixin):
     '''
     Base class for generating JSON responses using Mappers.
     '''
-    response_class = http.JsonResponse
+    response_class = JsonResponse
+    response_format = None
     content_type = 'application/json'
     mapper_class = None
     include_meta = False
+    query_plan = True
+    query_columns = True
+    stream = False
+    stream_chunk_size = 2000
+    stream_response_class = StreamingJSONResponse
+    conditional = False
 
     ok_status = http.STATUS.OK
     accepted_status = http.STATUS.ACCEPTED
@@ -36,6 +52,21 @@ class MapperMixin(JsonMixin):
     deleted_status = http.STATUS.NO_CONTENT
     error_status = http.STATUS.BAD_REQUEST
 
+    def dispatch(self, request, *args, **kwargs):
+        '''
+        If the client prefers one of our binary FORMATS, use its response
+        class instead of `response_class`.  As only JSON can be streamed,
+        `stream` is then ignored.
+        '''
+        self.response_format = self.get_response_format()
+        if self.response_format is not None:
+            self.response_class = RESPONSE_CLASSES[self.response_format]
+            self.stream = False
+        response = super().dispatch(request, *args, **kwargs)
+        if self.FORMATS:
+            patch_vary_headers(response, ('Accept',))
+        return response
+
     def get_mapper(self, obj=None):
         '''
         Get the mapper to use for this request.
@@ -44,6 +75,58 @@ class MapperMixin(JsonMixin):
         '''
         return self.mapper_class(obj)
 
+    def get_update_fields(self, obj, changed):
+        '''
+        Returns the names of the fields of obj to save, given the names of
+        those which changed: the changed fields, plus any with ``auto_now``
+        set.
+
+        If changed is None (save all fields) or empty (save nothing), it is
+        returned as is.
+        '''
+        if not changed:
+            return changed
+        return changed + [
+            f.name
+            for f in obj._meta.concrete_fields
+            if getattr(f, 'auto_now', False) and f.name not in changed
+        ]
+
+    def plan_queryset(self, queryset):
+        '''
+        Apply the query plan of ``self.mapper_class`` to queryset, if it
+        provides one and ``self.query_plan`` is set.
+
+        For GET and HEAD requests, if ``self.query_columns`` is set, only the
+        columns the mapper reads will be selected.
+        '''
+        if not self.query_plan:
+            return queryset
+        try:
+            plan = self.mapper_class._query_plan
+        except AttributeError:
+            return queryset
+        select, prefetch = plan()
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if self.query_columns and self.request.method in ('GET', 'HEAD'):
+            columns = self.get_query_columns()
+            if columns is not None:
+                queryset = queryset.only(*columns)
+        return queryset
+
+    def get_query_columns(self):
+        '''
+        Returns the list of columns to restrict querysets to, or None.
+        '''
+        columns = self.mapper_class._query_columns()
+        version = self.get_version_field()
+        if columns is not None and self.conditional and version:
+            columns.append(version)
+        return columns
+
     def empty_response(self, **kwargs):
         '''
         Helper method to return an empty response.
@@ -61,8 +144,8 @@ class MapperMixin(JsonMixin):
         If `mapper` is not passed, it will try to use `self.mapper`.  If
         `self.mapper` is not set, it will call `self.get_mapper()`.
 
-        Returns a `self.response_class` instance, passed ``mapper << obj``,
-        along with `**kwargs`.
+        Returns a `self.response_class` instance, passed the result of
+        ``self.reduce_object``, along with `**kwargs`.
         '''
         try:
             obj = kwargs.pop('object')
@@ -80,7 +163,18 @@ class MapperMixin(JsonMixin):
             except AttributeError:
                 mapper = self.get_mapper(obj)
 
-        return self.response_class(mapper << obj, **kwargs)
+        if not self.is_conditional(**kwargs):
+            return self.response_class(self.reduce_object(mapper, obj), **kwargs)
+
+        etag = last_modified = None
+        version = self.get_version_field()
+        if version:
+            etag, last_modified = self.get_validators([getattr(obj, version)])
+            if self.is_not_modified(etag, last_modified):
+                return self.not_modified_response(etag, last_modified)
+
+        response = self.response_class(self.reduce_object(mapper, obj), **kwargs)
+        return self.conditional_response(response, etag, last_modified)
 
     def multiple_response(self, **kwargs):
         '''
@@ -93,8 +187,15 @@ class MapperMixin(JsonMixin):
         If `mapper` is not passed, it will try to use `self.mapper`.  If
         `self.mapper` is not set, it will call `self.get_mapper()`.
 
-        Returns a `self.response_class` instance, passed a list of ``mapper <<
-        obj`` applied to each object, along with `**kwargs`.
+        Returns a `self.response_class` instance, passed the result of
+        ``self.reduce_list``, along with `**kwargs`.
+
+        If `self.stream` is set, a `self.stream_response_class` is returned
+        instead, and objects are fetched and reduced as the response is sent.
+
+        If `self.conditional` is set, responses to GET and HEAD will include an
+        ETag, and a 304 response will be returned if the client's copy is
+        current.  Last-Modified is not used for lists.
         '''
         kwargs.setdefault('safe', False)
 
@@ -121,19 +222,170 @@ class MapperMixin(JsonMixin):
             paginator = page = None
             is_paginated = False
 
-        data = [mapper << obj for obj in object_list]
-
-        if page_size or self.include_meta:
+        with_meta = page_size or self.include_meta
+        if with_meta:
             meta = self.get_meta(page)
+
+        conditional = self.is_conditional(**kwargs)
+        etag = None
+        version = self.get_version_field() if conditional else None
+        if version:
+            if isinstance(object_list, QuerySet):
+                versions = list(object_list.values_list('pk', version))
+            else:
+                versions = [(obj.pk, getattr(obj, version)) for obj in object_list]
+            # The latest version does not change when objects leave the list,
+            # so only the ETag is used.
+            etag, _ = self.get_validators(
+                [value for pk, value in versions],
+                extra=(versions, meta if with_meta else None),
+            )
+            if self.is_not_modified(etag):
+                return self.not_modified_response(etag)
+
+        data = self.reduce_list(mapper, object_list)
+
+        if with_meta:
             data = {
                 'meta': meta,
                 'data': data,
             }
 
-        return self.response_class(data, **kwargs)
+        if self.stream:
+            response = self.stream_response_class(data, **kwargs)
+        else:
+            response = self.response_class(data, **kwargs)
+        if conditional:
+            response = self.conditional_response(response, etag)
+        return response
+
+    def reduce_object(self, mapper, obj):
+        '''
+        Returns ``mapper << obj``, using the mapper's reduce cache if it has
+        one.
+        '''
+        try:
+            reduce_cached = mapper._reduce_cached
+        except AttributeError:
+            return mapper << obj
+        return reduce_cached([obj], **mapper._context)[0]
+
+    def reduce_list(self, mapper, object_list):
+        '''
+        Reduce each object in object_list using mapper.
+
+        Returns a list of ``mapper << obj`` for each object, or a generator if
+        ``self.stream`` is set.
+
+        When not streaming, the mapper's reduce cache is used if it has one.
+        '''
+        if self.stream:
+            return mapper._iter_reduce(self.iter_object_list(object_list), **mapper._context)
+        try:
+            reduce_many = mapper._reduce_cached
+        except AttributeError:
+            reduce_many = mapper._reduce_many
+        return reduce_many(object_list, **mapper._context)
+
+    def iter_object_list(self, object_list):
+        '''
+        Iterate object_list without caching it all in memory.
+
+        QuerySets are fetched in chunks of ``self.stream_chunk_size``, with
+        any prefetch_related lookups applied to each chunk.
+        '''
+        if not isinstance(object_list, QuerySet):
+            yield from object_list
+            return
+        chunk_size = self.stream_chunk_size
+        lookups = object_list._prefetch_related_lookups
+        if not lookups:
+            yield from object_list.iterator(chunk_size=chunk_size)
+            return
+        iterator = object_list.prefetch_related(None).iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            prefetch_related_objects(chunk, *lookups)
+            yield from chunk
+
+    def is_conditional(self, **kwargs):
+        '''
+        Should this response support conditional requests?
+        '''
+        return (
+            self.conditional and
+            self.request.method in ('GET', 'HEAD') and
+            kwargs.get('status', self.ok_status) == self.ok_status
+        )
+
+    def get_version_field(self):
+        '''
+        Returns the name of the attribute declared as `version` on the mapper's
+        Meta, if any.
+        '''
+        try:
+            return self.mapper_class._meta.version
+        except AttributeError:
+            return None
+
+    def get_validators(self, versions, extra=None):
+        '''
+        Returns an (etag, last_modified) tuple from a list of version values.
+
+        If all the versions are datetimes, last_modified is the latest of them.
+        '''
+        token = extra or versions
+        if self.response_format is not None:
+            # Each format is a different representation.
+            token = (token, self.response_format)
+        etag = quote_etag(md5(repr(token).encode('utf-8')).hexdigest())
+        last_modified = None
+        if versions and all(isinstance(value, datetime.datetime) for value in versions):
+            last_modified = timegm(max(versions).utctimetuple())
+        return etag, last_modified
+
+    def is_not_modified(self, etag, last_modified=None):
+        '''
+        Does the request show the client has a current copy?
+        '''
+        if_none_match = self.request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+        if last_modified is not None:
+            since = parse_http_date_safe(self.request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+            return since is not None and last_modified <= since
+        return False
+
+    def not_modified_response(self, etag, last_modified=None):
+        response = http.NotModified()
+        self.set_validators(response, etag, last_modified)
+        return response
+
+    def set_validators(self, response, etag, last_modified=None):
+        if etag is not None:
+            response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+
+    def conditional_response(self, response, etag=None, last_modified=None):
+        '''
+        Add validators to the response.
+
+        If no etag is given, it is computed from the response content, and a
+        304 returned if it matches the request.
+        '''
+        if etag is None and not response.streaming:
+            etag = quote_etag(md5(response.content).hexdigest())
+            if self.is_not_modified(etag):
+                return self.not_modified_response(etag)
+        self.set_validators(response, etag, last_modified)
+        return response
 
     def get_meta(self, page):
-        if not page:
+        if page is None:
             return {}
         return {
             'offset': page.start_index() - 1,
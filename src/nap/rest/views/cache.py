@@ -0,0 +1,167 @@
+from hashlib import md5
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+
+# Response cache.
+#
+# Each tag has a version token stored in the cache.  Responses are keyed by the
+# tokens of their tags, so replacing a tag's token invalidates every response
+# with that tag, without needing to find them.
+
+
+def tag_key(tag):
+    return 'nap:response:tag:%s' % tag
+
+
+def get_tag_versions(cache, tags):
+    '''
+    Returns a list of the current version tokens for tags, creating any which
+    are missing.
+    '''
+    keys = [tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(cache, tags):
+    '''
+    Invalidate all responses cached with any of tags.
+    '''
+    cache.set_many({tag_key(tag): uuid4().hex for tag in tags}, None)
+
+
+class ResponseCacheMixin:
+    '''
+    Cache the encoded response to GET requests.
+
+    Responses are tagged with the label of the view's model, and invalidated
+    by valid POST, PUT, PATCH and DELETE requests.
+    '''
+    response_cache = 'default'
+    response_cache_timeout = 300
+    response_cache_tags = ()
+    response_cache_vary = ('Accept', 'Authorization', 'Cookie')
+
+    def get(self, request, *args, **kwargs):
+        cache = caches[self.response_cache]
+        key = self.get_response_cache_key(cache)
+        cached = cache.get(key)
+        if cached is not None:
+            return self.cached_response(*cached)
+        response = super().get(request, *args, **kwargs)
+        patch_vary_headers(response, self.response_cache_vary)
+        if self.can_cache_response(response):
+            cached = (response.status_code, response.content, list(response.items()))
+            cache.set(key, cached, self.response_cache_timeout)
+        return response
+
+    def get_response_cache_tags(self):
+        '''
+        Returns the list of tags for responses from this view.
+
+        By default, the label of the model, and ``self.response_cache_tags``.
+        '''
+        model = self.model or self.get_queryset().model
+        return [model._meta.label_lower] + list(self.response_cache_tags)
+
+    def get_response_cache_key(self, cache):
+        '''
+        Returns the cache key for the response to this request.
+
+        Built from the versions of our tags, the request path, query string,
+        and headers listed in ``self.response_cache_vary``.
+        '''
+        request = self.request
+        versions = get_tag_versions(cache, self.get_response_cache_tags())
+        headers = [
+            request.META.get('HTTP_' + header.upper().replace('-', '_'))
+            for header in self.response_cache_vary
+        ]
+        token = (versions, request.path, sorted(request.GET.lists()), headers)
+        return 'nap:response:%s' % md5(repr(token).encode('utf-8')).hexdigest()
+
+    def can_cache_response(self, response):
+        '''
+        Only successful, non-streaming responses which set no cookies are
+        cached.
+        '''
+        return response.status_code == 200 and not response.streaming and not response.cookies
+
+    def cached_response(self, status, content, headers):
+        '''
+        Rebuild a response from the cache, honouring conditional request
+        headers if it has an ETag or Last-Modified.
+        '''
+        response = HttpResponse(content, status=status)
+        for name, value in headers:
+            response[name] = value
+        last_modified = response.get('Last-Modified')
+        if last_modified:
+            last_modified = parse_http_date_safe(last_modified)
+        return get_conditional_response(
+            self.request,
+            etag=response.get('ETag'),
+            last_modified=last_modified,
+            response=response,
+        )
+
+    def invalidate_response_cache(self):
+        '''
+        Invalidate all cached responses sharing our tags.
+
+        If a transaction is open, this is deferred until it commits, so
+        responses built from the old data are not cached under the new tag
+        versions, and nothing is invalidated if it rolls back.
+        '''
+        cache = caches[self.response_cache]
+        tags = self.get_response_cache_tags()
+        model = self.model or self.get_queryset().model
+        transaction.on_commit(
+            lambda: invalidate_tags(cache, tags),
+            using=router.db_for_write(model),
+        )
+
+    def post_valid(self, **kwargs):
+        response = super().post_valid(**kwargs)
+        self.invalidate_response_cache()
+        return response
+
+    def post_bulk_valid(self, **kwargs):
+        response = super().post_bulk_valid(**kwargs)
+        self.invalidate_response_cache()
+        return response
+
+    def patch_bulk_valid(self, **kwargs):
+        response = super().patch_bulk_valid(**kwargs)
+        self.invalidate_response_cache()
+        return response
+
+    def delete_bulk_valid(self, queryset, **kwargs):
+        response = super().delete_bulk_valid(queryset, **kwargs)
+        self.invalidate_response_cache()
+        return response
+
+    def put_valid(self, **kwargs):
+        response = super().put_valid(**kwargs)
+        self.invalidate_response_cache()
+        return response
+
+    def patch_valid(self, **kwargs):
+        response = super().patch_valid(**kwargs)
+        self.invalidate_response_cache()
+        return response
+
+    def delete_valid(self, **kwargs):
+        response = super().delete_valid(**kwargs)
+        self.invalidate_response_cache()
+        return response
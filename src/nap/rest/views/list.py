@@ -1,11 +1,165 @@
-from django.core.exceptions import ValidationError
+from django.core.cache import caches
+from django.core.exceptions import NON_FIELD_ERRORS, ImproperlyConfigured, ValidationError
+from django.db import connections, router, transaction
+from django.db.models import QuerySet, prefetch_related_objects
+from django.forms.utils import ErrorDict, ErrorList
 from django.views.generic.list import MultipleObjectMixin
 
+from nap import http
+from nap.mapper.models import ToManyField, invalidate_reduce_cache_many, to_pk
+
+from ..pagination import (
+    CursorPage, CursorPaginator, InvalidCursor, UncountedPage, UncountedPaginator, count_cached, count_capped,
+)
 from .base import MapperMixin, NapView
 
 
 # List views
 class ListMixin(MapperMixin, MultipleObjectMixin):
+    columnar = False
+    use_values = False
+    cursor_pagination = False
+    cursor_kwarg = 'cursor'
+    count_strategy = 'exact'
+    count_limit = 1000
+    count_cache = 'default'
+    count_cache_timeout = 300
+    bulk_batch_size = 500
+
+    def reduce_list(self, mapper, object_list):
+        '''
+        If ``self.columnar`` is set, returns a dict of the field names, and a
+        list of rows of values in the same order, instead of a list of dicts.
+
+        If ``self.use_values`` is set, and the mapper permits, records will be
+        fetched using ``values_list()`` instead of as model instances.
+        '''
+        if self.can_use_values(mapper, object_list):
+            chunk_size = self.stream_chunk_size if self.stream else None
+            data = mapper._reduce_values(object_list, rows=self.columnar, chunk_size=chunk_size)
+        elif self.columnar and self.stream:
+            data = mapper._iter_rows(self.iter_object_list(object_list), **mapper._context)
+        elif self.columnar:
+            data = mapper._reduce_rows(object_list, **mapper._context)
+        else:
+            return super().reduce_list(mapper, object_list)
+        if self.columnar:
+            data = {
+                'fields': list(mapper._field_names),
+                'rows': data,
+            }
+        return data
+
+    def can_use_values(self, mapper, object_list):
+        '''
+        Can object_list be reduced by mapper using values_list()?
+        '''
+        if not self.use_values or not isinstance(object_list, QuerySet):
+            return False
+        try:
+            return mapper._values_columns() is not None
+        except AttributeError:
+            return False
+
+    def get_queryset(self):
+        return self.plan_queryset(super().get_queryset())
+
+    def get_query_columns(self):
+        columns = super().get_query_columns()
+        if columns is not None and self.cursor_pagination:
+            columns.extend(name.lstrip('-') for name in self.get_cursor_ordering())
+        return columns
+
+    def get_cursor_ordering(self):
+        '''
+        Returns the ordering to use for cursor pagination.
+
+        Uses ``get_ordering()``, with the primary key appended to ensure it is
+        unique.
+        '''
+        ordering = self.get_ordering() or []
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        ordering = list(ordering)
+        pk_names = {'pk', self.model._meta.pk.name}
+        if not pk_names & {name.lstrip('-') for name in ordering}:
+            ordering.append('pk')
+        return ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        '''
+        If ``self.cursor_pagination`` is set, paginates using a cursor taken
+        from ``self.cursor_kwarg`` in the query string, instead of an offset.
+        '''
+        if not self.cursor_pagination:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.get_cursor_ordering())
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise http.BadRequest('Invalid cursor')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        '''
+        Unless ``self.count_strategy`` is 'exact', use a paginator which does
+        not need to count the records.
+        '''
+        if self.count_strategy == 'exact':
+            return super().get_paginator(queryset, per_page, **kwargs)
+        return UncountedPaginator(queryset, per_page, **kwargs)
+
+    def get_total(self, queryset):
+        '''
+        Count the records in queryset according to ``self.count_strategy``.
+
+        Returns a tuple of (total, capped), where capped is True if there are
+        more than ``total`` records.
+        '''
+        strategy = self.count_strategy
+        if strategy == 'exact':
+            return queryset.count(), False
+        if strategy == 'capped':
+            total = count_capped(queryset, self.count_limit)
+            return min(total, self.count_limit), total > self.count_limit
+        if strategy == 'cached':
+            cache = caches[self.count_cache]
+            return count_cached(queryset, cache, self.count_cache_timeout), False
+        if strategy == 'none':
+            return None, False
+        raise ImproperlyConfigured('Unknown count_strategy: %r' % strategy)
+
+    def get_meta(self, page):
+        if isinstance(page, UncountedPage):
+            meta = {
+                'offset': max(page.start_index() - 1, 0),
+                'page': page.number,
+                'has_next': page.has_next(),
+            }
+            total, capped = self.get_total(page.paginator.object_list)
+            if total is not None:
+                meta['total'] = total
+            if capped:
+                meta['total_capped'] = True
+            return meta
+        if not isinstance(page, CursorPage):
+            return super().get_meta(page)
+        return {
+            'next': page.next_cursor,
+            'prev': page.prev_cursor,
+            'next_url': self.get_cursor_url(page.next_cursor),
+            'prev_url': self.get_cursor_url(page.prev_cursor),
+        }
+
+    def get_cursor_url(self, cursor):
+        '''
+        Returns the URL of this request with the cursor replaced.
+        '''
+        if cursor is None:
+            return None
+        query = self.request.GET.copy()
+        query[self.cursor_kwarg] = cursor
+        return '%s?%s' % (self.request.path, query.urlencode())
 
     def ok_response(self, **kwargs):
         '''
@@ -26,6 +180,7 @@ class ListGetMixin:
 
 
 class ListPostMixin:
+    allow_bulk = False
 
     def post(self, request, *args, **kwargs):
         '''
@@ -33,10 +188,17 @@ class ListPostMixin:
 
         Validates the data against the `model_class`, and calls `post_valid` or
         `post_invalid` as appropriate.
+
+        If ``self.allow_bulk`` is set and the data is a list, calls
+        `post_bulk` instead.
         '''
-        self.mapper = self.get_mapper(self.model())
         self.data = self.get_request_data()
 
+        if self.allow_bulk and isinstance(self.data, list):
+            return self.post_bulk()
+
+        self.mapper = self.get_mapper(self.model())
+
         try:
             self.object = self.mapper._apply(self.data)
         except ValidationError:
@@ -52,16 +214,376 @@ class ListPostMixin:
         '''
         return self.error_response(errors)
 
+    def prepare_object(self, obj):
+        '''
+        Called with each new object before it is saved, by both `post_valid`
+        and `post_bulk_valid`.
+
+        Override this, rather than `post_valid`, to set values not taken from
+        the request data.
+        '''
+        pass
+
     def post_valid(self, **kwargs):
         '''
         Called on valid POST data.
 
-        Saves self.object and returns a `created_response`.
+        Calls `prepare_object`, saves self.object and returns a
+        `created_response`.
         '''
+        self.prepare_object(self.object)
         self.object.save()
 
         return self.created_response(**kwargs)
 
+    def post_bulk(self):
+        '''
+        Handle POST of a list of objects.
+
+        Validates each element using the mapper, and calls `post_bulk_valid`
+        or `post_bulk_invalid` as appropriate.
+
+        Related records referenced by all elements are fetched with one query
+        for each related model, using ``_related_resolver``.
+
+        Values for ToManyFields are not applied to the objects, but collected
+        in ``self.related``, a list of ``{attr: [pk, ...]}`` for each object.
+
+        Elements repeating the unique values of an earlier element are
+        invalid, using `check_bulk_unique`.
+        '''
+        errors = ErrorDict()
+        m2m = {f.name for f in self.model._meta.many_to_many}
+        resolver = self.get_mapper(self.model())._related_resolver(self.data)
+        self.object_list = []
+        self.related = []
+        indexes = []
+
+        for idx, data in enumerate(self.data):
+            if not isinstance(data, dict):
+                errors[idx] = ErrorList(['Expected an object.'])
+                continue
+            mapper = self.get_mapper(self.model())
+            mapper._resolver = resolver
+            many = {
+                name: field
+                for name, field in mapper._fields.items()
+                if isinstance(field, ToManyField) and field.attr in m2m
+                and not field.readonly and name in data
+            }
+            try:
+                obj = mapper._apply({
+                    key: value
+                    for key, value in data.items()
+                    if key not in many
+                })
+            except ValidationError:
+                errors[idx] = mapper._errors
+                continue
+
+            related = {}
+            for name, field in many.items():
+                values = related[field.attr] = []
+                invalid = ErrorList()
+                for item in data[name] or ():
+                    try:
+                        value = resolver.get(field, item)
+                    except ValidationError as e:
+                        invalid.extend(e.messages)
+                    else:
+                        values.append(getattr(value, 'pk', value))
+                if invalid:
+                    errors.setdefault(idx, ErrorDict())[name] = invalid
+            self.object_list.append(obj)
+            self.related.append(related)
+            indexes.append(idx)
+
+        self.check_bulk_unique(indexes, errors)
+
+        if errors:
+            return self.post_bulk_invalid(errors)
+
+        return self.post_bulk_valid()
+
+    def post_bulk_invalid(self, errors):
+        '''
+        Called when any element of a bulk POST is invalid.
+
+        errors maps the index of each invalid element to its errors.
+
+        Returns an `error_response`.
+        '''
+        return self.error_response(errors)
+
+    def post_bulk_valid(self, **kwargs):
+        '''
+        Called when every element of a bulk POST is valid.
+
+        Calls `prepare_object` for each object, then saves
+        ``self.object_list`` using `bulk_create` and adds all ToManyField
+        values, in a single transaction.
+
+        If the database can not return the PKs of records created by
+        `bulk_create`, each object is saved in turn instead.
+
+        Returns a response with the created objects, using a ``status`` of
+        ``self.created_status``.
+        '''
+        for obj in self.object_list:
+            self.prepare_object(obj)
+        db = router.db_for_write(self.model)
+        with transaction.atomic(using=db):
+            if connections[db].features.can_return_rows_from_bulk_insert:
+                manager = self.model._default_manager.db_manager(db)
+                manager.bulk_create(self.object_list, batch_size=self.bulk_batch_size)
+            else:
+                for obj in self.object_list:
+                    obj.save(using=db)
+            if any(self.related):
+                self.bulk_add_related(db)
+
+        mapper = self.get_mapper()
+        try:
+            select, prefetch = mapper._query_plan()
+        except AttributeError:
+            pass
+        else:
+            if self.query_plan and (select or prefetch):
+                prefetch_related_objects(self.object_list, *select, *prefetch)
+
+        kwargs.setdefault('status', self.created_status)
+        kwargs.setdefault('safe', False)
+        return self.response_class(mapper._reduce_many(self.object_list, **mapper._context), **kwargs)
+
+    def bulk_add_related(self, db):
+        '''
+        Create the through records for ToManyField values in ``self.related``
+        with one bulk_create for each field.
+
+        Fields with a custom through model, or which are symmetrical, are
+        added to each object in turn using the related manager instead, after
+        fetching the related records.
+        '''
+        opts = self.model._meta
+        attrs = {attr for related in self.related for attr in related}
+        for attr in attrs:
+            field = opts.get_field(attr)
+            through = field.remote_field.through
+            if not through._meta.auto_created or field.remote_field.symmetrical:
+                # Pass instances, as the through model may not refer to the PK.
+                records = field.related_model._default_manager.db_manager(db).in_bulk({
+                    value
+                    for related in self.related
+                    for value in related.get(attr, ())
+                })
+                for obj, related in zip(self.object_list, self.related):
+                    if related.get(attr):
+                        getattr(obj, attr).add(*[records[value] for value in related[attr]])
+                continue
+            source = through._meta.get_field(field.m2m_field_name())
+            target = through._meta.get_field(field.m2m_reverse_field_name())
+            through._default_manager.db_manager(db).bulk_create([
+                through(**{
+                    source.attname: getattr(obj, source.target_field.attname),
+                    target.attname: value,
+                })
+                for obj, related in zip(self.object_list, self.related)
+                for value in dict.fromkeys(related.get(attr, ()))
+            ], batch_size=self.bulk_batch_size)
+
+    def check_bulk_unique(self, indexes, errors):
+        '''
+        Add to errors any object in ``self.object_list`` with the same unique
+        values as an earlier one, which would otherwise fail on insert.
+
+        indexes holds the position in the request data of each object.
+        '''
+        seen = set()
+        for idx, obj in zip(indexes, self.object_list):
+            unique_checks, date_checks = obj._get_unique_checks()
+            for model, check in unique_checks:
+                values = tuple(getattr(obj, obj._meta.get_field(name).attname) for name in check)
+                if any(value is None for value in values):
+                    continue
+                key = (model, check, values)
+                if key not in seen:
+                    seen.add(key)
+                    continue
+                name = check[0] if len(check) == 1 else NON_FIELD_ERRORS
+                obj_errors = errors.setdefault(idx, ErrorDict())
+                obj_errors.setdefault(name, ErrorList()).append(obj.unique_error_message(model, check))
+
+
+class ListPatchMixin:
+
+    def patch(self, request, *args, **kwargs):
+        '''
+        Handle PATCH of a list of objects.
+
+        Each element must include the PK of an object in our queryset, as
+        ``pk`` or the name of the model's PK field.  All objects are fetched
+        in one query, and patched using the mapper.  Related records are
+        fetched with one query for each related model.
+
+        Calls `patch_bulk_valid` or `patch_bulk_invalid` as appropriate.
+        '''
+        self.data = self.get_request_data()
+        if not isinstance(self.data, list):
+            raise http.BadRequest('Expected a list.')
+
+        pk_names = ('pk', self.model._meta.pk.name)
+        pks = [
+            to_pk(self.model, next((data[name] for name in pk_names if name in data), None))
+            if isinstance(data, dict) else None
+            for data in self.data
+        ]
+        objects = self.get_queryset().in_bulk({value for value in pks if value is not None})
+        resolver = self.get_mapper(self.model())._related_resolver(self.data)
+
+        errors = ErrorDict()
+        self.object_list = []
+        self.changed = []
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            for idx, (data, obj_pk) in enumerate(zip(self.data, pks)):
+                if obj_pk not in objects:
+                    errors[idx] = ErrorList(['Object not found.'])
+                    continue
+                obj = objects[obj_pk]
+                mapper = self.get_mapper(obj)
+                mapper._resolver = resolver
+                try:
+                    mapper._patch({
+                        key: value
+                        for key, value in data.items()
+                        if key not in pk_names
+                    })
+                except ValidationError:
+                    errors[idx] = mapper._errors
+                    continue
+                changed = self.get_update_fields(obj, mapper._changed_fields())
+                if changed is None:
+                    changed = [f.name for f in self.model._meta.concrete_fields if not f.primary_key]
+                self.object_list.append(obj)
+                self.changed.append(changed)
+
+            if errors:
+                # Undo any changes made by ToManyFields.
+                transaction.set_rollback(True)
+                return self.patch_bulk_invalid(errors)
+
+            return self.patch_bulk_valid()
+
+    def patch_bulk_invalid(self, errors):
+        '''
+        Called when any element of a bulk PATCH is invalid.
+
+        errors maps the index of each invalid element to its errors.
+
+        Returns an `error_response`.
+        '''
+        return self.error_response(errors)
+
+    def patch_bulk_valid(self, **kwargs):
+        '''
+        Called when every element of a bulk PATCH is valid.
+
+        Saves ``self.object_list`` using `bulk_update`, with one query for
+        each distinct set of changed fields.  Objects with no changes are not
+        saved.  As `bulk_update` sends no signals, cached reduced forms of the
+        saved objects are removed here, once the transaction commits.
+
+        Fields with ``auto_now`` set are updated along with any changes, as
+        `save` would.
+
+        Returns a response with the updated objects.
+        '''
+        auto_now = [f for f in self.model._meta.concrete_fields if getattr(f, 'auto_now', False)]
+        groups = {}
+        for obj, changed in zip(self.object_list, self.changed):
+            if changed:
+                # bulk_update does not call pre_save.
+                for f in auto_now:
+                    if f.name in changed:
+                        f.pre_save(obj, False)
+                groups.setdefault(tuple(changed), []).append(obj)
+        db = router.db_for_write(self.model)
+        manager = self.model._default_manager.db_manager(db)
+        for changed, objs in groups.items():
+            manager.bulk_update(objs, changed, batch_size=self.bulk_batch_size)
+            # Deferred until the transaction opened by patch commits.
+            invalidate_reduce_cache_many(self.model, objs, using=db)
+
+        kwargs.setdefault('status', self.ok_status)
+        kwargs.setdefault('safe', False)
+        mapper = self.get_mapper()
+        return self.response_class(mapper._reduce_many(self.object_list, **mapper._context), **kwargs)
+
+
+class ListDeleteMixin:
+    delete_filter_fields = ()
+    raw_delete = False
+
+    def delete(self, request, *args, **kwargs):
+        '''
+        Handle DELETE on a List view.
+
+        Deletes the objects selected by `get_delete_queryset` in one query,
+        and calls `delete_bulk_valid`.
+        '''
+        return self.delete_bulk_valid(self.get_delete_queryset())
+
+    def get_delete_queryset(self):
+        '''
+        Returns the queryset of objects to delete.
+
+        If the request data is a list, selects objects in ``get_queryset()``
+        with those PKs.  Otherwise filters by query string values for names in
+        ``self.delete_filter_fields``.
+
+        Raises BadRequest if no objects are selected.
+        '''
+        data = self.get_request_data()
+        queryset = self.get_queryset()
+        if isinstance(data, list):
+            pks = [to_pk(self.model, value) for value in data]
+            if None in pks:
+                raise http.BadRequest('Invalid pk.')
+            return queryset.filter(pk__in=pks)
+
+        filters = {
+            name: value
+            for name, value in self.request.GET.items()
+            if name in self.delete_filter_fields
+        }
+        if not filters:
+            raise http.BadRequest('No objects selected.')
+        try:
+            return queryset.filter(**filters)
+        except (ValidationError, ValueError, TypeError):
+            raise http.BadRequest('Invalid filter.')
+
+    def delete_bulk_valid(self, queryset, **kwargs):
+        '''
+        Delete all objects in queryset.
+
+        If ``self.raw_delete`` is set, uses a single DELETE query, without
+        collecting related objects or sending signals.  Cached reduced forms
+        of the objects are still removed.
+
+        Returns a response with the number of objects deleted, using a
+        ``status`` of ``self.ok_status``.
+        '''
+        queryset = queryset.select_related(None).prefetch_related(None).order_by()
+        if self.raw_delete:
+            invalidate_reduce_cache_many(self.model, queryset)
+            count = queryset._raw_delete(queryset.db)
+        else:
+            total, counts = queryset.delete()
+            count = counts.get(self.model._meta.label, 0)
+
+        kwargs.setdefault('status', self.ok_status)
+        return self.response_class({'count': count}, **kwargs)
+
 
 class ListBaseView(ListMixin, NapView):
     '''
@@ -7,10 +7,30 @@ from .base import MapperMixin, NapView
 # Object views
 class ObjectMixin(MapperMixin, SingleObjectMixin):
 
+    def get_queryset(self):
+        return self.plan_queryset(super().get_queryset())
+
     def ok_response(self, **kwargs):
         kwargs.setdefault('status', self.ok_status)
         return self.single_response(**kwargs)
 
+    def save_object(self):
+        '''
+        Save ``self.object``, writing only the fields which have changed if
+        ``self.mapper`` can tell us.  If nothing changed, it is not saved.
+
+        Fields with ``auto_now`` set are saved along with any changes.
+        '''
+        try:
+            changed = self.mapper._changed_fields()
+        except AttributeError:
+            changed = None
+        changed = self.get_update_fields(self.object, changed)
+        if changed is None:
+            self.object.save()
+        elif changed:
+            self.object.save(update_fields=changed)
+
 
 class ObjectGetMixin:
 
@@ -34,7 +54,7 @@ class ObjectPutMixin:
         return self.put_valid()
 
     def put_valid(self, **kwargs):
-        self.object.save()
+        self.save_object()
         return self.ok_response(**kwargs)
 
     def put_invalid(self, errors):
@@ -57,7 +77,7 @@ class ObjectPatchMixin:
         return self.patch_valid()
 
     def patch_valid(self, **kwargs):
-        self.object.save()
+        self.save_object()
         return self.ok_response(**kwargs)
 
     def patch_invalid(self, errors):
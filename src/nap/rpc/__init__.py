@@ -1,2 +1 @@
-
-from .views import RPCMixin, RPCView, method  # NOQA
+from .views import AsyncRPCMixin, AsyncRPCView, RPCMixin, RPCView, method  # NOQA
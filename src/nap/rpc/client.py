@@ -1,6 +1,19 @@
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class RPCError(Exception):
+    '''An error returned for a call in a batch.'''
+    def __init__(self, status, message):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
 
 
 class RPCProxy:
@@ -9,21 +22,260 @@ class RPCProxy:
         self.name = name
 
     def __call__(self, **kwargs):
-        resp = self.client.session.post(
-            self.client.endpoint,
-            data=json.dumps(kwargs),
-            headers={
-                'X-Rpc-Action': self.name,
-                'Content-Type': 'application/json',
-            },
+        return self.client._call(self.name, kwargs)
+
+
+class BatchCall:
+    '''
+    A call queued in a batch.
+
+    Once the batch has been sent, `result` holds the returned value, or raises
+    an RPCError.
+    '''
+    def __init__(self, id, name, params):
+        self.id = id
+        self.name = name
+        self.params = params
+        self.done = False
+        self._result = None
+        self.error = None
+
+    @property
+    def result(self):
+        if not self.done:
+            raise RuntimeError('Batch has not been sent.')
+        if self.error is not None:
+            raise self.error
+        return self._result
+
+
+class BatchProxy:
+    def __init__(self, batch, name):
+        self.batch = batch
+        self.name = name
+
+    def __call__(self, **kwargs):
+        return self.batch._add(self.name, kwargs)
+
+
+class RPCBatch:
+    '''
+    Queues calls, and sends them in a single request when the context exits.
+
+    Calling any method on the batch queues a call, returning a BatchCall.
+
+        with client._batch() as batch:
+            total = batch.add(a=1, b=2)
+        print(total.result)
+    '''
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._send()
+
+    def __getattr__(self, key):
+        if key.startswith('_'):
+            raise AttributeError(key)
+        return BatchProxy(self, key)
+
+    def _add(self, name, params):
+        call = BatchCall(len(self._calls), name, params)
+        self._calls.append(call)
+        return call
+
+    def _send(self):
+        if not self._calls:
+            return []
+        resp = self._client._post(
+            [
+                {'id': call.id, 'action': call.name, 'params': call.params}
+                for call in self._calls
+            ],
+            {'X-Rpc-Batch': '1'},
         )
-        return resp.json()
+        resp.raise_for_status()
+        calls = {call.id: call for call in self._calls}
+        for result in self._client._decode(resp):
+            call = calls.get(result.get('id'))
+            if call is None:
+                continue
+            if 'error' in result:
+                call.error = RPCError(**result['error'])
+            else:
+                call._result = result.get('result')
+            call.done = True
+        return self._calls
 
 
 class RPCClient:
-    def __init__(self, endpoint):
+    '''
+    Calls methods on an RPC view.
+
+    Connections are kept alive, and pooled: `pool_connections` is the number
+    of hosts to keep pools for, and `pool_maxsize` the number of connections
+    to keep for each.
+
+    `timeout` is passed to requests, and may be a number of seconds or a
+    (connect, read) tuple.
+
+    Up to `retries` attempts are made to retry a call which failed to connect,
+    or which returned a status in `retry_statuses`, waiting longer between
+    each as set by `backoff_factor`.  Calls are not retried once a request has
+    been sent and no response received, as it may have been acted on.
+
+    Only 503 is retried by default.  A 502 or 504 from a proxy may be sent
+    after the server acted on the call, so adding them can run a call twice.
+
+    If `format` is 'msgpack', requests are sent, and responses requested, as
+    MessagePack.  This requires the msgpack library.
+
+    Any attribute not set here is an RPC method, so the client's own methods
+    start with an underscore, as for Mappers.
+    '''
+    def __init__(self, endpoint, timeout=None, retries=0, backoff_factor=0.1,
+                 retry_statuses=(503,), pool_connections=10, pool_maxsize=10,
+                 format='json'):
         self.endpoint = endpoint
+        self._timeout = timeout
+        self._msgpack = None
+        if format == 'msgpack':
+            import msgpack
+            self._msgpack = msgpack
+        elif format != 'json':
+            raise ValueError('Unknown format: %r' % format)
+        self._format = format
+        self._pool_maxsize = pool_maxsize
         self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=0,
+                status=retries,
+                status_forcelist=retry_statuses,
+                allowed_methods=frozenset(['POST']),
+                backoff_factor=backoff_factor,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def __getattr__(self, key):
         return RPCProxy(self, key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._close()
+
+    def _post(self, data, headers):
+        '''
+        POST data, encoded as JSON or MessagePack, to the endpoint.
+        '''
+        if self._format == 'msgpack':
+            data = self._msgpack.packb(data, use_bin_type=True)
+            headers = dict(headers, **{
+                'Content-Type': 'application/msgpack',
+                'Accept': 'application/msgpack, application/json;q=0.5',
+            })
+        else:
+            data = json.dumps(data, separators=(',', ':'))
+            headers = dict(headers, **{'Content-Type': 'application/json'})
+        return self.session.post(self.endpoint, data=data, headers=headers, timeout=self._timeout)
+
+    def _decode(self, resp):
+        '''
+        Decode the body of a response, according to its Content-Type.
+
+        MessagePack responses are decoded even if JSON was requested, which
+        requires the msgpack library.
+        '''
+        content_type = resp.headers.get('Content-Type', '').split(';')[0].strip()
+        if content_type in ('application/msgpack', 'application/x-msgpack'):
+            msgpack = self._msgpack
+            if msgpack is None:
+                import msgpack
+            return msgpack.unpackb(resp.content, raw=False)
+        return resp.json()
+
+    def _call(self, name, params):
+        '''
+        Call the RPC method name, returning the decoded response.
+        '''
+        return self._decode(self._post(params, {'X-Rpc-Action': name}))
+
+    def _batch(self):
+        '''
+        Returns a context manager which sends calls made on it in one request.
+        '''
+        return RPCBatch(self)
+
+    def _close(self):
+        self.session.close()
+
+
+class AsyncRPCBatch(RPCBatch):
+    '''
+    An RPCBatch to use with `async with`.
+    '''
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self._client._run(self._send)
+
+
+class AsyncRPCClient(RPCClient):
+    '''
+    An RPCClient for use from asyncio.
+
+    Calls return awaitables, and are made from a pool of threads sharing one
+    pool of connections, so many calls can be made concurrently:
+
+        async with AsyncRPCClient(url) as client:
+            results = await asyncio.gather(*(
+                client.add(a=x, b=1) for x in range(10)
+            ))
+
+    `max_workers` defaults to `pool_maxsize`.
+    '''
+    def __init__(self, endpoint, max_workers=None, **kwargs):
+        super().__init__(endpoint, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or self._pool_maxsize)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._close()
+
+    def _run(self, func, *args):
+        '''
+        Run func in our thread pool, returning an awaitable.
+        '''
+        return asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+    async def _call(self, name, params):
+        return await self._run(super()._call, name, params)
+
+    def _batch(self):
+        '''
+        Returns an async context manager which sends calls made on it in one
+        request.
+        '''
+        return AsyncRPCBatch(self)
+
+    def _close(self):
+        self._executor.shutdown(wait=False)
+        super()._close()
@@ -1,11 +1,23 @@
 
+import asyncio
 import inspect
 import json
+from functools import update_wrapper
+
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
 
 from nap import http
+from nap.http.response import RESPONSE_CLASSES, JsonResponse
 from nap.rest.views import NapView
 from nap.utils import JsonMixin
 
+# asgiref is installed with Django 3.0+
+try:
+    from asgiref.sync import async_to_sync, sync_to_async
+except ImportError:
+    async_to_sync = sync_to_async = None
+
 RPC_MARKER = '_rpc'
 
 
@@ -20,9 +32,70 @@ def is_rpc_method(m):
     return getattr(m, RPC_MARKER, False)
 
 
+class RPCMethod:
+    '''
+    A publishable method, with its signature and the argument names it
+    accepts, computed once per class.
+    '''
+    __slots__ = ('name', 'attr', 'signature', 'required', 'accepted', 'doc', 'is_async')
+
+    def __init__(self, cls, name):
+        self.name = name
+        # The raw attribute, so we can bind it to an instance cheaply.
+        self.attr = inspect.getattr_static(cls, name)
+        func = getattr(cls, name)
+        signature = inspect.signature(func)
+        params = list(signature.parameters.values())
+        if inspect.isfunction(self.attr):
+            # Drop self
+            params = params[1:]
+        self.signature = signature.replace(parameters=params)
+        self.doc = inspect.getdoc(func)
+        self.is_async = asyncio.iscoroutinefunction(func)
+
+        kinds = (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+        self.required = frozenset(
+            param.name for param in params
+            if param.kind in kinds and param.default is param.empty
+        )
+        if any(param.kind == inspect.Parameter.VAR_KEYWORD for param in params):
+            self.accepted = None
+        else:
+            self.accepted = frozenset(param.name for param in params if param.kind in kinds)
+
+    def bind(self, instance):
+        return self.attr.__get__(instance, type(instance))
+
+    def check(self, data):
+        '''
+        Check data are valid arguments, or raise TypeError.
+        '''
+        if isinstance(data, dict):
+            keys = data.keys()
+            if self.required <= keys and (self.accepted is None or keys <= self.accepted):
+                return
+        # Let Signature.bind explain the problem.
+        self.signature.bind(**data)
+
+    def describe(self):
+        params = [
+            param for param in self.signature.parameters.values()
+            if param.kind not in (param.VAR_POSITIONAL, param.VAR_KEYWORD)
+        ]
+        defaults = tuple(param.default for param in params if param.default is not param.empty)
+        return {
+            'args': [param.name for param in params],
+            'doc': self.doc,
+            'defaults': defaults or None,
+        }
+
+
 class RPCMixin(JsonMixin):
     '''Mix in to a standard View to provide RPC actions'''
     permit_introspect = False
+    permit_batch = False
+    batch_atomic = False
+    max_batch_size = 100
 
     def post(self, request):
         '''
@@ -39,28 +112,179 @@ class RPCMixin(JsonMixin):
 
         Otherwise behaves as normal.
         '''
-        function_name = request.META.get('HTTP_X_RPC_ACTION', None)
-        if request.method == 'POST' and function_name is not None:
-            return self.dispatch_rpc(request, function_name)
+        if request.method == 'POST':
+            function_name = request.META.get('HTTP_X_RPC_ACTION', None)
+            if function_name is not None:
+                return self.dispatch_rpc(request, function_name)
+            if self.permit_batch and 'HTTP_X_RPC_BATCH' in request.META:
+                return self.dispatch_batch(request)
 
         return super().dispatch(request, *args, **kwargs)
 
     def dispatch_rpc(self, request, function_name):
-        func = getattr(self, function_name, None)
-        if not is_rpc_method(func):
-            return http.PreconditionFailed()
+        try:
+            method = self.get_rpc_method(function_name)
+        except http.BaseHttpResponse as e:
+            return e
 
         data = self.get_request_data({})
-        sig = inspect.signature(func)
+        try:
+            self.bind_rpc(method, data)
+        except http.BaseHttpResponse as e:
+            return e
 
+        resp = self.execute(self.get_handler(method), data)
+
+        return self.rpc_response(resp)
+
+    def rpc_response(self, data, **kwargs):
+        '''
+        Returns a JsonResponse of data, or a response in the binary format
+        the client prefers.
+        '''
+        response_format = self.get_response_format()
+        response_class = RESPONSE_CLASSES[response_format] if response_format else JsonResponse
+        response = response_class(data, **kwargs)
+        if self.FORMATS:
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+    def get_handler(self, method):
+        '''
+        Bind method to this view, wrapping coroutine functions to be called
+        synchronously.
+        '''
+        handler = method.bind(self)
+        if method.is_async:
+            handler = async_to_sync(handler)
+        return handler
+
+    def get_rpc_method(self, function_name):
+        '''
+        Find the RPCMethod for the publishable method called function_name, or
+        raise PreconditionFailed.
+        '''
         try:
-            sig.bind(**data)
+            return self._rpc_methods()[function_name]
+        except KeyError:
+            raise http.PreconditionFailed()
+
+    def bind_rpc(self, method, data):
+        '''
+        Check data are valid arguments for method, or raise BadRequest.
+        '''
+        try:
+            method.check(data)
         except TypeError as e:
-            return http.BadRequest(e.args[0])
+            raise http.BadRequest(e.args[0])
+
+    def dispatch_batch(self, request):
+        '''
+        Handle a list of calls in one request.
+
+        Each call is a dict of {"action": ..., "params": {...}, "id": ...}.
+        All calls are validated before any are executed, and then executed in
+        order.
+
+        Returns a list with, for each call, either {"id": ..., "result": ...}
+        or {"id": ..., "error": {"status": ..., "message": ...}}.
+
+        If `batch_atomic` is set, the calls are executed in a single
+        transaction, and no further calls are executed once one fails.
+        '''
+        try:
+            calls = self.get_batch_calls()
+        except http.BaseHttpResponse as e:
+            return e
+
+        return self.rpc_response(self.run_batch(calls), safe=False)
+
+    def get_batch_calls(self):
+        '''
+        Returns the list of calls in the request, or raises an error response.
+        '''
+        calls = self.get_request_data([])
+        if not isinstance(calls, list):
+            raise http.BadRequest('Batch must be a list.')
+        if len(calls) > self.max_batch_size:
+            raise http.RequestEntityTooLarge('Batch may contain at most %d calls.' % self.max_batch_size)
+        return calls
+
+    def run_batch(self, calls):
+        '''
+        Execute a list of calls, in a transaction if `batch_atomic` is set.
+        '''
+        if not self.batch_atomic:
+            return self.execute_batch(calls)
+        with transaction.atomic():
+            results = self.execute_batch(calls)
+            if any('error' in result for result in results):
+                transaction.set_rollback(True)
+        return results
+
+    def execute_batch(self, calls):
+        '''
+        Validate and execute a list of calls, returning a list of results.
+        '''
+        results, pending = self.prepare_batch(calls)
+
+        failed = self.batch_atomic and len(pending) < len(results)
+        for result, method, params in pending:
+            if failed:
+                result['error'] = self.batch_error(http.BaseHttpResponse(
+                    'Not executed.', status=http.STATUS.FAILED_DEPENDENCY,
+                ))
+                continue
+            try:
+                result['result'] = self.execute(self.get_handler(method), params)
+            except http.BaseHttpResponse as e:
+                result['error'] = self.batch_error(e)
+                failed = self.batch_atomic
+
+        return results
+
+    def prepare_batch(self, calls):
+        '''
+        Validate a list of calls.
 
-        resp = self.execute(func, data)
+        Returns the list of results, with errors filled in for invalid calls,
+        and a list of (result, method, params) for the valid calls.
+        '''
+        results = []
+        pending = []
+        for call in calls:
+            result = {'id': call.get('id') if isinstance(call, dict) else None}
+            try:
+                method, params = self.prepare_call(call)
+            except http.BaseHttpResponse as e:
+                result['error'] = self.batch_error(e)
+            else:
+                pending.append((result, method, params))
+            results.append(result)
+        return results, pending
 
-        return http.JsonResponse(resp)
+    def prepare_call(self, call):
+        '''
+        Validate a single call from a batch, returning its RPCMethod and
+        arguments.
+        '''
+        if not isinstance(call, dict) or not isinstance(call.get('action'), str):
+            raise http.BadRequest('Call must have an action.')
+        params = call.get('params', {})
+        if not isinstance(params, dict):
+            raise http.BadRequest('Params must be a dict.')
+        method = self.get_rpc_method(call['action'])
+        self.bind_rpc(method, params)
+        return method, params
+
+    def batch_error(self, response):
+        '''
+        Convert an HTTP response to an error for a batch result.
+        '''
+        return {
+            'status': response.status_code,
+            'message': response.content.decode(response.charset),
+        }
 
     def execute(self, handler, data):
         '''Helpful hook to ease wrapping the handler'''
@@ -78,21 +302,146 @@ class RPCMixin(JsonMixin):
             response.write(json.dumps(self._introspect()))
         return response
 
+    @classmethod
+    def _rpc_methods(cls):
+        '''
+        Returns a dict of the publishable methods of this class, by name.
+
+        Built on first use, and cached on the class.
+        '''
+        try:
+            return cls.__dict__['_rpc_registry']
+        except KeyError:
+            pass
+        registry = {
+            name: RPCMethod(cls, name)
+            for name, value in inspect.getmembers(cls, is_rpc_method)
+        }
+        cls._rpc_registry = registry
+        return registry
+
     def _introspect(self):
         '''
         Provides a list of methods available on this view.
         '''
-        methods = {}
-        for name, prop in inspect.getmembers(self, is_rpc_method):
-            argspec = inspect.getargspec(prop)
-            methods[name] = {
-                'args': argspec.args[1:],
-                'doc': inspect.getdoc(prop),
-                'defaults': argspec.defaults,
-            }
-        return methods
+        return {
+            name: method.describe()
+            for name, method in self._rpc_methods().items()
+        }
 
 
 class RPCView(RPCMixin, NapView):
     '''Courtesy class to avoid having to mix it yourself.'''
     pass
+
+
+class AsyncRPCMixin(RPCMixin):
+    '''
+    Mix in to a View to dispatch RPC actions asynchronously.
+
+    Methods defined with `async def` are awaited; other methods are run in a
+    thread using `sync_to_async`.  Requests other than RPC calls are passed to
+    the synchronous `dispatch` in a thread.
+    '''
+    batch_concurrent = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        '''
+        Return a coroutine function, so Django will call the view
+        asynchronously.
+        '''
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            try:
+                return await view(request, *args, **kwargs)
+            except http.BaseHttpResponse as resp:
+                return resp
+        update_wrapper(async_view, view)
+        return async_view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            function_name = request.META.get('HTTP_X_RPC_ACTION', None)
+            if function_name is not None:
+                return await self.dispatch_rpc_async(request, function_name)
+            if self.permit_batch and 'HTTP_X_RPC_BATCH' in request.META:
+                return await self.dispatch_batch_async(request)
+
+        return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+    async def dispatch_rpc_async(self, request, function_name):
+        try:
+            method = self.get_rpc_method(function_name)
+        except http.BaseHttpResponse as e:
+            return e
+
+        data = self.get_request_data({})
+        try:
+            self.bind_rpc(method, data)
+        except http.BaseHttpResponse as e:
+            return e
+
+        resp = await self.execute_async(method, data)
+
+        return self.rpc_response(resp)
+
+    async def execute_async(self, method, data):
+        '''
+        Call method with data, via `execute`.
+        '''
+        handler = method.bind(self)
+        if method.is_async:
+            return await self.execute(handler, data)
+        return await sync_to_async(self.execute)(handler, data)
+
+    async def dispatch_batch_async(self, request):
+        '''
+        Handle a list of calls in one request.
+
+        As for `dispatch_batch`, except if `batch_concurrent` is set, the calls
+        are run concurrently using `asyncio.gather`.
+
+        If `batch_atomic` is set, the batch is run in a thread, as
+        transactions can not span coroutines.
+        '''
+        try:
+            calls = self.get_batch_calls()
+        except http.BaseHttpResponse as e:
+            return e
+
+        if self.batch_atomic:
+            results = await sync_to_async(self.run_batch)(calls)
+        else:
+            results = await self.execute_batch_async(calls)
+
+        return self.rpc_response(results, safe=False)
+
+    async def execute_batch_async(self, calls):
+        '''
+        Validate and execute a list of calls, returning a list of results.
+        '''
+        results, pending = self.prepare_batch(calls)
+
+        if self.batch_concurrent:
+            await asyncio.gather(*(
+                self.execute_call_async(result, method, params)
+                for result, method, params in pending
+            ))
+        else:
+            for result, method, params in pending:
+                await self.execute_call_async(result, method, params)
+
+        return results
+
+    async def execute_call_async(self, result, method, params):
+        try:
+            result['result'] = await self.execute_async(method, params)
+        except http.BaseHttpResponse as e:
+            result['error'] = self.batch_error(e)
+
+
+class AsyncRPCView(AsyncRPCMixin, NapView):
+    '''Courtesy class to avoid having to mix it yourself.'''
+    pass
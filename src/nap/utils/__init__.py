@@ -20,6 +20,7 @@ class JsonMixin:
     '''
     CONTENT_TYPES = ['application/json', 'text/json']
     JSON_DECODER = None
+    FORMATS = ['application/msgpack', 'application/x-msgpack']
 
     def get_request_data(self, default=None):
         '''Retrieve data from request'''
@@ -36,6 +37,17 @@ class JsonMixin:
             except JSONDecodeError:
                 raise http.BadRequest()
 
+        if content_type in self.FORMATS:
+            from .formats import get_format
+            fmt = get_format(content_type)
+            if fmt is not None:
+                if not self.request.body:
+                    return default
+                try:
+                    return fmt.loads(self.request.body)
+                except ValueError:
+                    raise http.BadRequest()
+
         if self.request.method in ('PUT', 'PATCH'):
             if content_type == 'application/x-www-form-urlencoded':
                 return QueryDict(self.request.body, encoding=encoding)
@@ -50,10 +62,28 @@ class JsonMixin:
         return self.request.POST
 
     def loads(self, data, **kwargs):
-        '''Serialise data for responses.'''
+        '''
+        Deserialise request data.
+
+        Uses the configured JSON backend, unless JSON_DECODER or any extra
+        arguments are given.
+        '''
+        if self.JSON_DECODER is None and not kwargs:
+            from .backends import get_backend
+            return get_backend().loads(data)
         kwargs.setdefault('cls', self.JSON_DECODER)
         return json.loads(data, **kwargs)
 
+    def get_response_format(self):
+        '''
+        Returns the content type of the binary format in FORMATS the client
+        prefers, according to the Accept header, or None for JSON.
+        '''
+        if not self.FORMATS:
+            return None
+        from .formats import negotiate
+        return negotiate(self.request.META.get('HTTP_ACCEPT'), tuple(self.FORMATS))
+
 
 class List(list):
     '''
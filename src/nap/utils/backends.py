@@ -0,0 +1,159 @@
+'''
+Pluggable JSON backends.
+
+The backend is selected by the ``NAP_JSON_BACKEND`` setting, which may be one
+of 'auto' (the default), 'json', 'orjson', 'ujson', or the import path of a
+backend class.
+
+'auto' will use orjson if it is installed, otherwise the stdlib json module.
+'''
+import json
+from inspect import isgenerator
+
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+
+def default_for(encoder):
+    '''
+    Returns a function which serialises values the way encoder would, for
+    backends which accept a `default` hook instead of an encoder class.
+    '''
+    default = encoder().default
+
+    def inner(o):
+        # NapJSONEncoder wraps generators in a list-alike only json can use.
+        if isgenerator(o):
+            return list(o)
+        return default(o)
+    return inner
+
+
+def to_plain(data, default):
+    '''
+    Returns a copy of data containing only dicts, lists, strings, numbers,
+    booleans and None, passing any other values to default.
+    '''
+    if data is None or isinstance(data, (str, int, float)):
+        return data
+    if isinstance(data, dict):
+        return {key: to_plain(value, default) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [to_plain(value, default) for value in data]
+    return to_plain(default(data), default)
+
+
+class JsonBackend:
+    '''Uses the stdlib json module.'''
+
+    def dumps(self, data, encoder, **kwargs):
+        return json.dumps(data, cls=encoder, **kwargs)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonBackend(JsonBackend):
+    '''
+    Uses orjson.
+
+    Values orjson would serialise differently to Django (such as dates and
+    times) are passed to the encoder's `default`.
+
+    If any extra arguments (such as `indent`) are passed to dumps, or orjson
+    can not encode the data (such as integers beyond 64 bits), falls back to
+    json.
+
+    Unlike json, NaN and Infinity are encoded as null, which is valid JSON.
+    '''
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        self.option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        self.defaults = {}
+
+    def dumps(self, data, encoder, **kwargs):
+        if kwargs:
+            return super().dumps(data, encoder, **kwargs)
+        try:
+            default = self.defaults[encoder]
+        except KeyError:
+            default = self.defaults[encoder] = default_for(encoder)
+        try:
+            return self.orjson.dumps(data, default=default, option=self.option)
+        except self.orjson.JSONEncodeError:
+            return super().dumps(data, encoder)
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+
+class UjsonBackend(JsonBackend):
+    '''
+    Uses ujson.
+
+    ujson encodes Decimal values itself, as numbers, so the data is first
+    converted to plain types using the encoder's `default`, to match json.
+
+    If any extra arguments (such as `indent`) are passed to dumps, falls back
+    to json.
+    '''
+    def __init__(self):
+        import ujson
+        self.ujson = ujson
+        self.defaults = {}
+
+    def dumps(self, data, encoder, **kwargs):
+        if kwargs:
+            return super().dumps(data, encoder, **kwargs)
+        try:
+            default = self.defaults[encoder]
+        except KeyError:
+            default = self.defaults[encoder] = default_for(encoder)
+        return self.ujson.dumps(to_plain(data, default), ensure_ascii=False)
+
+    def loads(self, data):
+        try:
+            return self.ujson.loads(data)
+        except ValueError as e:
+            # nap.utils imports nap.http, which imports this module.
+            from . import JSONDecodeError
+            raise JSONDecodeError(str(e), data, 0)
+
+
+BACKENDS = {
+    'json': JsonBackend,
+    'orjson': OrjsonBackend,
+    'ujson': UjsonBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    '''
+    Returns the configured JSON backend instance.
+    '''
+    global _backend
+    if _backend is None:
+        from django.conf import settings
+        name = getattr(settings, 'NAP_JSON_BACKEND', 'auto')
+        if name == 'auto':
+            try:
+                _backend = OrjsonBackend()
+            except ImportError:
+                _backend = JsonBackend()
+        elif name in BACKENDS:
+            _backend = BACKENDS[name]()
+        else:
+            _backend = import_string(name)()
+    return _backend
+
+
+def reset_backend(**kwargs):
+    global _backend
+    if kwargs.get('setting', 'NAP_JSON_BACKEND') == 'NAP_JSON_BACKEND':
+        _backend = None
+
+
+setting_changed.connect(reset_backend)
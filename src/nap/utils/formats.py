@@ -0,0 +1,107 @@
+'''
+Binary serialisation formats, negotiated using Content-Type and Accept
+headers.
+
+JSON is always the default; a binary format is only used when the client asks
+for it, and its library is installed.
+'''
+from functools import lru_cache
+
+from .backends import default_for
+
+
+class MsgpackFormat:
+    '''
+    Uses msgpack.
+
+    Values msgpack can not serialise (such as dates and times) are passed to
+    the encoder's `default`, so they match JSON output.
+    '''
+    content_type = 'application/msgpack'
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+        self.defaults = {}
+
+    def dumps(self, data, encoder):
+        try:
+            default = self.defaults[encoder]
+        except KeyError:
+            default = self.defaults[encoder] = default_for(encoder)
+        return self.msgpack.packb(data, default=default, use_bin_type=True)
+
+    def loads(self, data):
+        '''
+        Decode data, raising ValueError if it is invalid.
+        '''
+        try:
+            return self.msgpack.unpackb(data, raw=False)
+        except (ValueError, TypeError) as e:
+            raise ValueError(str(e))
+
+
+FORMATS = {
+    'application/msgpack': MsgpackFormat,
+    'application/x-msgpack': MsgpackFormat,
+}
+
+JSON_TYPES = {'application/json', 'text/json', 'application/*', '*/*'}
+
+_formats = {}
+
+
+def get_format(content_type):
+    '''
+    Returns the format instance for content_type, or None if it is unknown or
+    its library is not installed.
+    '''
+    try:
+        return _formats[content_type]
+    except KeyError:
+        pass
+    try:
+        fmt = FORMATS[content_type]()
+    except (KeyError, ImportError):
+        fmt = None
+    _formats[content_type] = fmt
+    return fmt
+
+
+def parse_accept(accept):
+    '''
+    Returns the media types in an Accept header, most preferred first.
+    '''
+    types = []
+    for idx, item in enumerate(accept.split(',')):
+        media_type, *params = item.split(';')
+        media_type = media_type.strip().lower()
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            types.append((-quality, idx, media_type))
+    return [media_type for _, _, media_type in sorted(types)]
+
+
+@lru_cache(maxsize=128)
+def negotiate(accept, content_types):
+    '''
+    Returns which of content_types the Accept header prefers over JSON, or
+    None.
+    '''
+    if not accept:
+        return None
+    for media_type in parse_accept(accept):
+        if media_type in JSON_TYPES:
+            return None
+        if media_type in content_types and get_format(media_type) is not None:
+            return media_type
+    return None
@@ -1,13 +1,71 @@
 from django.db import models
 
 
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+
+
+class TagAlias(models.Model):
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, to_field='name')
+    alias = models.CharField(max_length=50)
+
+
 class Poll(models.Model):
     question = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     kill_date = models.DateTimeField(blank=True, null=True)
+    tags = models.ManyToManyField(Tag, blank=True)
+
+    @property
+    def first_choice(self):
+        return self.choice_set.order_by('pk').first()
+
+    @property
+    def voted_choices(self):
+        return self.choice_set.filter(votes__gt=0)
 
 
 class Choice(models.Model):
     poll = models.ForeignKey(Poll, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
     votes = models.IntegerField(default=0)
+
+
+class VisibleManager(models.Manager):
+
+    def get_queryset(self):
+        return super().get_queryset().filter(hidden=False)
+
+
+class Voter(models.Model):
+    name = models.CharField(max_length=50)
+    hidden = models.BooleanField(default=False)
+
+    objects = VisibleManager()
+
+
+class Vote(models.Model):
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, limit_choices_to={'votes__gte': 0})
+    voter = models.ForeignKey(Voter, on_delete=models.CASCADE, null=True)
+
+    class Meta:
+        unique_together = [('choice', 'voter')]
+
+
+class Topic(models.Model):
+    code = models.CharField(max_length=10, primary_key=True)
+
+
+class Survey(models.Model):
+    title = models.CharField(max_length=50, unique=True)
+    updated = models.DateTimeField(auto_now=True)
+    topics = models.ManyToManyField(Topic, blank=True)
+    tags = models.ManyToManyField(Tag, through='SurveyTag', blank=True)
+
+
+class SurveyTag(models.Model):
+    survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name='+')
+    tagged = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+', to_field='name')
+
+    class Meta:
+        unique_together = [('survey', 'tagged')]
@@ -1,8 +1,10 @@
+from django.utils.functional import cached_property
+
 from nap import mapper
 from nap.rest import views
 from nap.shortcuts import get_object_or_404
 
-from .models import Poll, Choice
+from .models import Poll, Choice, Survey
 
 
 class PollMapper(mapper.ModelMapper):
@@ -32,6 +34,21 @@ class PollListView(PollMixin,
     pass
 
 
+class ColumnarPollListView(PollListView):
+    columnar = True
+
+
+class StreamingPollListView(PollListView):
+    stream = True
+    stream_chunk_size = 1
+
+
+class CursorPollListView(PollListView):
+    cursor_pagination = True
+    paginate_by = 2
+    ordering = ('-pub_date',)
+
+
 class SinglePollView(PollMixin,
                      views.ObjectGetMixin,
                      views.ObjectPutMixin,
@@ -56,6 +73,67 @@ class ChoiceListView(ChoiceMixin,
     def get_queryset(self):
         return super().get_queryset().filter(poll__id=self.kwargs['poll_id'])
 
-    def post_valid(self):
-        self.object.poll = get_object_or_404(Poll, pk=self.kwargs['poll_id'])
-        return super().post_valid()
+    @cached_property
+    def poll(self):
+        return get_object_or_404(Poll, pk=self.kwargs['poll_id'])
+
+    def prepare_object(self, obj):
+        obj.poll = self.poll
+
+
+class ValuesChoiceListView(ChoiceListView):
+    use_values = True
+
+
+class StreamingChoiceListView(ValuesChoiceListView):
+    stream = True
+
+
+class TaggedPollMapper(PollMapper):
+    tags = mapper.ToManyField('tags')
+
+
+class PollTagsMapper(mapper.ModelMapper):
+    class Meta:
+        model = Poll
+        fields = ['question']
+
+    tags = mapper.ToManyField('tags')
+
+
+class TaggedPollListView(PollListView):
+    mapper_class = PollTagsMapper
+    use_values = True
+
+
+class BulkPollListView(views.ListPatchMixin, views.ListDeleteMixin, PollListView):
+    allow_bulk = True
+    mapper_class = TaggedPollMapper
+    delete_filter_fields = ('question', 'pub_date__lt')
+
+
+class BulkChoiceListView(ChoiceMixin, views.ListDeleteMixin, views.ListBaseView):
+    raw_delete = True
+
+
+class SurveyMapper(mapper.ModelMapper):
+    class Meta:
+        model = Survey
+        fields = ['title']
+
+    topics = mapper.ToManyField('topics')
+    tags = mapper.ToManyField('tags')
+
+
+class BulkSurveyListView(views.ListGetMixin, views.ListPostMixin, views.ListPatchMixin, views.ListBaseView):
+    model = Survey
+    mapper_class = SurveyMapper
+    allow_bulk = True
+
+
+class CachedPollListView(views.ResponseCacheMixin, PollListView):
+    pass
+
+
+class CachedSinglePollView(views.ResponseCacheMixin, SinglePollView):
+    pass
@@ -1,4 +1,8 @@
-from nap import rpc
+import asyncio
+
+from nap import http, rpc
+
+from .models import Tag
 
 
 class View(rpc.RPCView):
@@ -7,3 +11,88 @@ class View(rpc.RPCView):
     @rpc.method
     def echo(self, **kwargs):
         return kwargs
+
+    @rpc.method
+    def close(self, **kwargs):
+        return {'close': kwargs}
+
+
+class BatchView(View):
+    permit_batch = True
+    max_batch_size = 5
+
+    @rpc.method
+    def add(self, a, b):
+        return a + b
+
+    @rpc.method
+    def fail(self):
+        raise http.BadRequest('Failed.')
+
+    @rpc.method
+    def tag(self, name):
+        return Tag.objects.create(name=name).pk
+
+    @rpc.method
+    async def double(self, value):
+        return value * 2
+
+    attempts = 0
+
+    @rpc.method
+    def flaky(self):
+        # Fails every other call
+        BatchView.attempts += 1
+        if BatchView.attempts % 2:
+            raise http.BaseHttpResponse(status=http.STATUS.TOO_MANY_REQUESTS)
+        return {'attempts': BatchView.attempts}
+
+
+class AtomicBatchView(BatchView):
+    batch_atomic = True
+
+
+class AsyncView(rpc.AsyncRPCView):
+    permit_batch = True
+
+    @rpc.method
+    def echo(self, **kwargs):
+        return kwargs
+
+    @rpc.method
+    async def async_echo(self, **kwargs):
+        return kwargs
+
+    @rpc.method
+    async def double(self, value):
+        return value * 2
+
+    @rpc.method
+    def tag(self, name):
+        return Tag.objects.create(name=name).pk
+
+    @rpc.method
+    async def wait(self):
+        # Only completes if `release` runs concurrently.
+        try:
+            await asyncio.wait_for(self.event.wait(), 0.5)
+        except asyncio.TimeoutError:
+            raise http.RequestTimeout()
+        return 'done'
+
+    @rpc.method
+    async def release(self):
+        self.event.set()
+        return 'released'
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.event = asyncio.Event()
+
+
+class ConcurrentView(AsyncView):
+    batch_concurrent = True
+
+
+class AtomicAsyncView(AsyncView):
+    batch_atomic = True
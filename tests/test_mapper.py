@@ -3,7 +3,7 @@ from types import SimpleNamespace
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 
-from nap.mapper import Mapper, field, Field
+from nap.mapper import Mapper, context_field, field, Field
 
 
 class TestMapper(Mapper):
@@ -154,3 +154,111 @@ class MapperTest(TestCase):
 
         m._apply({})
         self.assertEqual(o.f, 1)
+
+    def test_010_compiled_reduce(self):
+        class Upper(Field):
+            def get(self, value):
+                return value.upper()
+
+        class Custom(Field):
+            def __get__(self, instance, cls=None):
+                if instance is None:
+                    return self
+                return 'custom'
+
+        class M(Mapper):
+            plain = Field('a')
+            missing = Field('missing', default=7)
+            upper = Upper('b')
+            upper_null = Upper('c', null=True)
+            custom = Custom('a')
+
+            @field
+            def fget(self):
+                return self.a * 2
+
+            @context_field
+            def ctx(self, context):
+                return context['x']
+
+        class N(M):
+            _compile_reduce = False
+
+        o = SimpleNamespace(a=1, b='foo', c=None)
+        expected = {
+            'plain': 1,
+            'missing': 7,
+            'upper': 'FOO',
+            'upper_null': None,
+            'custom': 'custom',
+            'fget': 2,
+            'ctx': 'x',
+        }
+
+        self.assertEqual(N(o, x='x')._reduce(), expected)
+        self.assertEqual(M(o, x='x')._reduce(), expected)
+        self.assertEqual(list(M(o, x='x')._reduce()), list(N(o, x='x')._reduce()))
+        self.assertIn('reduce', M._compiled)
+        self.assertNotIn('reduce', N._compiled)
+
+        # Sub-classes compile their own fields, even after the parent.
+        class P(M):
+            extra = Field('b')
+
+        self.assertIsNot(P._compiled, M._compiled)
+        self.assertEqual(P(o, x='x')._reduce(), dict(expected, extra='foo'))
+        self.assertEqual(M(o, x='x')._reduce(), expected)
+
+    def test_011_reduce_many(self):
+        class M(Mapper):
+            value = Field('value')
+            double = Field('double', null=True)
+
+            @field
+            def upper(self):
+                return self.value.upper()
+
+            @context_field
+            def ctx(self, context):
+                return context['x']
+
+        class N(M):
+            def _reduce(self):
+                return {'value': self._obj.value}
+
+        objs = [
+            SimpleNamespace(value='a', double=None),
+            SimpleNamespace(value='b', double=2),
+        ]
+        expected = [M(x=1) << obj for obj in objs]
+
+        self.assertEqual(M._reduce_many(objs, x=1), expected)
+        self.assertEqual(list(M._iter_reduce(iter(objs), x=1)), expected)
+        self.assertEqual(M._reduce_many([]), [])
+        self.assertEqual(N._reduce_many(objs), [{'value': 'a'}, {'value': 'b'}])
+
+    def test_012_reduce_rows(self):
+        class M(Mapper):
+            value = Field('value')
+            double = Field('double', null=True)
+
+            @field
+            def upper(self):
+                return self.value.upper()
+
+        class N(M):
+            _compile_reduce = False
+
+        objs = [
+            SimpleNamespace(value='a', double=None),
+            SimpleNamespace(value='b', double=2),
+        ]
+        expected = [M(obj)._reduce() for obj in objs]
+
+        for mapper in (M, N):
+            rows = mapper._reduce_rows(objs)
+            self.assertEqual(rows, list(mapper._iter_rows(objs)))
+            self.assertEqual(
+                [dict(zip(mapper._field_names, row)) for row in rows],
+                expected,
+            )
@@ -1,9 +1,14 @@
 # from types import SimpleNamespace
+from datetime import timedelta
 
-from django.test import TestCase
-# from django.core.exceptions import ValidationError
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
 
-from nap.mapper import ModelMapper, field, Field
+from nap.mapper import ModelMapper, ToManyField, ToOneField, field, Field
+from nap.mapper.models import invalidate_reduce_cache_many
 
 from . import models
 
@@ -82,3 +87,523 @@ class ModelMapperTestCase(TestCase):
                 return len(self.choice_text)
 
         self.assertEqual(len(O._fields), 3)
+
+    def test_to_many_mapper(self):
+        class C(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = ('choice_text', 'votes')
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ('question',)
+
+            choices = ToManyField('choice_set', mapper=C)
+
+        poll = models.Poll.objects.create(question='?', pub_date=timezone.now())
+        models.Choice.objects.create(poll=poll, choice_text='a', votes=1)
+        models.Choice.objects.create(poll=poll, choice_text='b', votes=2)
+
+        data = P() << poll
+        self.assertEqual(data['choices'], [
+            {'choice_text': 'a', 'votes': 1},
+            {'choice_text': 'b', 'votes': 2},
+        ])
+
+    def test_query_plan(self):
+        class C(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = ('choice_text',)
+
+            poll = ToOneField('poll', model=models.Poll)
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ('question',)
+
+            choices = ToManyField('choice_set', mapper=C)
+
+        class D(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = ('choice_text',)
+
+            poll = ToOneField('poll', model=models.Poll, mapper=P)
+
+        self.assertEqual(C._query_plan(), ([], []))
+        self.assertEqual(P._query_plan(), ([], ['choice_set']))
+        self.assertEqual(D._query_plan(), (['poll'], ['poll__choice_set']))
+
+    def test_query_plan_property(self):
+        class C(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = ('choice_text',)
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ('question',)
+
+            voted = ToManyField('voted_choices')
+            first = ToOneField('first_choice', model=models.Choice, mapper=C)
+            tags = ToManyField('tags')
+
+        # Properties can not be prefetched or selected, so are skipped.
+        self.assertEqual(P._query_plan(), ([], ['tags']))
+
+        poll = models.Poll.objects.create(question='?', pub_date=timezone.now())
+        choice = models.Choice.objects.create(poll=poll, choice_text='a', votes=1)
+        models.Choice.objects.create(poll=poll, choice_text='b')
+        select, prefetch = P._query_plan()
+        queryset = models.Poll.objects.select_related(*select).prefetch_related(*prefetch)
+        self.assertEqual(P._reduce_many(queryset), [{
+            'question': '?',
+            'voted': [choice.pk],
+            'first': {'choice_text': 'a'},
+            'tags': [],
+        }])
+
+    def test_to_one_reads_id(self):
+        class C(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = '__all__'
+
+        poll = models.Poll.objects.create(question='?', pub_date=timezone.now())
+        choice = models.Choice.objects.create(poll=poll, choice_text='a')
+        choice = models.Choice.objects.get(pk=choice.pk)
+
+        with self.assertNumQueries(0):
+            data = C() << choice
+        self.assertEqual(data['poll'], poll.pk)
+
+        other = models.Poll.objects.create(question='!', pub_date=timezone.now())
+        C(choice)._patch({'poll': other.pk})
+        self.assertEqual(choice.poll, other)
+
+    def test_to_one_reads_id_copies(self):
+        poll_field = ToOneField('poll')
+
+        class C(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = ['choice_text']
+
+            poll = poll_field
+
+        self.assertTrue(C.poll.id_only)
+        self.assertEqual(C.poll.attr, 'poll_id')
+        # The declared field is left alone
+        self.assertFalse(poll_field.id_only)
+        self.assertEqual(poll_field.attr, 'poll')
+
+    def test_to_one_to_field(self):
+        class A(ModelMapper):
+            class Meta:
+                model = models.TagAlias
+                fields = '__all__'
+
+        tag = models.Tag.objects.create(name='news')
+        alias = models.TagAlias.objects.create(tag=tag, alias='headlines')
+        # The local column holds the name, not the PK
+        self.assertFalse(A.tag.id_only)
+        self.assertEqual((A() << alias)['tag'], tag.pk)
+
+    def test_query_columns(self):
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ('question',)
+
+            choices = ToManyField('choice_set')
+
+        class Q(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ('question',)
+
+        class C(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = ('choice_text', 'poll')
+
+        class D(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = ('choice_text',)
+
+            poll = ToOneField('poll', model=models.Poll, mapper=Q)
+
+        class E(D):
+            @field
+            def votes_str(self):
+                return str(self.votes)
+
+        class F(D):
+            @field(columns=['votes'])
+            def votes_str(self):
+                return str(self.votes)
+
+        self.assertEqual(P._query_columns(), ['question'])
+        self.assertEqual(sorted(C._query_columns()), ['choice_text', 'poll'])
+        self.assertEqual(sorted(D._query_columns()), ['choice_text', 'poll', 'poll__question'])
+        self.assertIsNone(E._query_columns())
+        self.assertEqual(sorted(F._query_columns()), ['choice_text', 'poll', 'poll__question', 'votes'])
+
+        poll = models.Poll.objects.create(question='?', pub_date=timezone.now())
+        models.Choice.objects.create(poll=poll, choice_text='a', votes=3)
+        qs = models.Choice.objects.select_related('poll').only(*F._query_columns())
+        with self.assertNumQueries(1):
+            self.assertEqual(F._reduce_many(qs), [
+                {'choice_text': 'a', 'poll': {'question': '?'}, 'votes_str': '3'},
+            ])
+
+    def test_reduce_values(self):
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = '__all__'
+
+        class C(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = '__all__'
+
+        class D(C):
+            @field
+            def double(self):
+                return self.votes * 2
+
+        self.assertEqual(sorted(P._values_columns()), ['id', 'kill_date', 'pub_date', 'question'])
+        self.assertEqual(sorted(C._values_columns()), ['choice_text', 'id', 'poll_id', 'votes'])
+        self.assertIsNone(D._values_columns())
+
+        class T(P):
+            tags = ToManyField('tags')
+
+        self.assertIsNone(T._values_columns())
+
+        poll = models.Poll.objects.create(question='?', pub_date=timezone.now())
+        models.Poll.objects.create(question='!', pub_date=timezone.now(), kill_date=timezone.now())
+        models.Choice.objects.create(poll=poll, choice_text='a', votes=1)
+        models.Choice.objects.create(poll=poll, choice_text='b', votes=2)
+
+        for mapper in (P, C):
+            qs = mapper._meta.model.objects.order_by('pk')
+            self.assertEqual(mapper._reduce_values(qs), mapper._reduce_many(qs))
+            self.assertEqual(mapper._reduce_values(qs, rows=True), mapper._reduce_rows(qs))
+
+    def test_reduce_cached_version(self):
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ['question', 'pub_date']
+                cache = 'default'
+                version = 'pub_date'
+
+        poll = models.Poll.objects.create(question='a', pub_date=timezone.now())
+        key = P._cache_key(poll)
+        poll.pub_date = timezone.now() + timedelta(days=1)
+        self.assertNotEqual(P._cache_key(poll), key)
+
+    def test_reduce_cached_related(self):
+        # Changes to related objects would not invalidate the cache
+        with self.assertRaises(ValueError):
+            class P(ModelMapper):
+                class Meta:
+                    model = models.Poll
+                    fields = ['question']
+                    cache = 'default'
+
+                choices = ToManyField('choice_set')
+
+        class Q(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ['question']
+
+        with self.assertRaises(ValueError):
+            class C(ModelMapper):
+                class Meta:
+                    model = models.Choice
+                    fields = ['choice_text']
+                    cache = 'default'
+
+                poll = ToOneField('poll', mapper=Q)
+
+        # Only the local column is read for a plain ToOneField
+        class D(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = ['choice_text', 'poll']
+                cache = 'default'
+
+        self.assertTrue(D.poll.id_only)
+
+    def test_changed_fields(self):
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = '__all__'
+
+        poll = models.Poll.objects.create(question='a', pub_date=timezone.now())
+        mapper = P(poll)
+        self.assertIsNone(mapper._changed_fields())
+
+        mapper._patch({'question': 'a'})
+        self.assertEqual(mapper._changed_fields(), [])
+        mapper._patch({'question': 'b', 'kill_date': '2016-05-13 00:00:00'})
+        self.assertEqual(mapper._changed_fields(), ['question', 'kill_date'])
+
+        pk = poll.pk
+        mapper._patch({'id': pk + 1})
+        self.assertIsNone(mapper._changed_fields())
+
+        mapper = P(models.Poll(pub_date=timezone.now()))
+        mapper._patch({'question': 'c'})
+        self.assertIsNone(mapper._changed_fields())
+
+        # Deferred fields are not loaded
+        poll = models.Poll.objects.only('question').get(pk=pk)
+        mapper = P(poll)
+        with self.assertNumQueries(0):
+            mapper._patch({'question': 'd'})
+        self.assertEqual(mapper._changed_fields(), ['question'])
+
+    def test_patch_clean(self):
+
+        class T(ModelMapper):
+            class Meta:
+                model = models.Tag
+                fields = '__all__'
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = '__all__'
+
+        models.Tag.objects.create(name='a')
+        tag = models.Tag.objects.create(name='b')
+
+        # Unique checks only run if a unique field changed
+        mapper = T(tag)
+        with self.assertNumQueries(0):
+            mapper._patch({'name': 'b'})
+        with self.assertNumQueries(1):
+            mapper._patch({'name': 'c'})
+        with self.assertRaises(ValidationError):
+            mapper._patch({'name': 'a'})
+        self.assertIn('name', mapper._errors)
+        with self.assertRaises(ValidationError):
+            mapper._patch({'name': ''})
+
+        # Only submitted fields are validated
+        poll = models.Poll(question='x' * 300, pub_date=timezone.now())
+        mapper = P(poll)
+        mapper._patch({'kill_date': None})
+        with self.assertRaises(ValidationError):
+            mapper._patch({'question': 'y' * 300})
+
+    def test_related_resolver_validation(self):
+
+        class V(ModelMapper):
+            class Meta:
+                model = models.Vote
+                fields = '__all__'
+
+        poll = models.Poll.objects.create(question='?', pub_date=timezone.now())
+        choice = models.Choice.objects.create(poll=poll, choice_text='a')
+        negative = models.Choice.objects.create(poll=poll, choice_text='b', votes=-1)
+        voter = models.Voter.objects.create(name='a')
+        hidden = models.Voter.objects.create(name='b', hidden=True)
+        models.Vote.objects.create(choice=choice, voter=voter)
+
+        def apply(row):
+            resolver = V._related_resolver([row])
+            mapper = V(models.Vote())
+            mapper._resolver = resolver
+            try:
+                mapper._apply(row)
+            except ValidationError:
+                pass
+            return mapper._errors
+
+        other = models.Voter.objects.create(name='c')
+        self.assertEqual(apply({'choice': choice.pk, 'voter': other.pk}), {})
+        # Fetched with the default manager, as ToOneField.set does.
+        self.assertIn('voter', apply({'choice': choice.pk, 'voter': hidden.pk}))
+        # limit_choices_to is applied
+        self.assertIn('choice', apply({'choice': negative.pk, 'voter': other.pk}))
+        # blank=False is still checked
+        self.assertIn('voter', apply({'choice': choice.pk, 'voter': None}))
+        # unique_together including a resolved field is still checked
+        self.assertIn('__all__', apply({'choice': choice.pk, 'voter': voter.pk}))
+
+    def test_to_one_default_manager(self):
+
+        class V(ModelMapper):
+            class Meta:
+                model = models.Vote
+                fields = '__all__'
+
+        poll = models.Poll.objects.create(question='?', pub_date=timezone.now())
+        choice = models.Choice.objects.create(poll=poll, choice_text='a')
+        voter = models.Voter.objects.create(name='a')
+        hidden = models.Voter.objects.create(name='b', hidden=True)
+
+        vote = V()._apply({'choice': choice.pk, 'voter': voter.pk})
+        self.assertEqual(vote.voter, voter)
+        # Records hidden by the default manager can not be linked to.
+        mapper = V()
+        with self.assertRaises(ValidationError):
+            mapper._apply({'choice': choice.pk, 'voter': hidden.pk})
+        self.assertIn('voter', mapper._errors)
+
+    def test_related_resolver(self):
+
+        class C(ModelMapper):
+            class Meta:
+                model = models.Choice
+                fields = '__all__'
+
+        class Q(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = '__all__'
+
+            tags = ToManyField('tags')
+
+        now = timezone.now()
+        polls = [models.Poll.objects.create(question=str(idx), pub_date=now) for idx in range(3)]
+        tags = [models.Tag.objects.create(name=str(idx)) for idx in range(2)]
+
+        rows = [
+            {'poll': poll.pk, 'choice_text': 'x'}
+            for poll in polls
+        ] + [{'poll': 0, 'choice_text': 'x'}]
+        # One query for all polls
+        with self.assertNumQueries(1):
+            resolver = C._related_resolver(rows)
+        with self.assertNumQueries(0):
+            choices = []
+            for row in rows[:-1]:
+                mapper = C(models.Choice())
+                mapper._resolver = resolver
+                choices.append(mapper._apply(row))
+        self.assertEqual([choice.poll_id for choice in choices], [poll.pk for poll in polls])
+
+        mapper = C(models.Choice())
+        mapper._resolver = resolver
+        with self.assertRaises(ValidationError):
+            mapper._apply(rows[-1])
+        self.assertIn('poll', mapper._errors)
+
+        # Without a resolver, missing records are also a ValidationError
+        with self.assertRaises(ValidationError):
+            C(models.Choice())._apply(rows[-1])
+
+        rows = [{'tags': [tag.pk for tag in tags]}, {'tags': [str(tags[0].pk)]}]
+        resolver = Q._related_resolver(rows)
+        for poll, row in zip(polls, rows):
+            mapper = Q(poll)
+            mapper._resolver = resolver
+            mapper._patch(row)
+        self.assertEqual(set(polls[0].tags.all()), set(tags))
+        self.assertEqual(list(polls[1].tags.all()), tags[:1])
+
+
+class ReduceCacheTestCase(TransactionTestCase):
+
+    def test_reduce_cached(self):
+        calls = []
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ['question']
+                cache = 'default'
+
+            @field
+            def counted(self):
+                calls.append(self.pk)
+                return self.pk
+
+        caches['default'].clear()
+        a = models.Poll.objects.create(question='a', pub_date=timezone.now())
+        b = models.Poll.objects.create(question='b', pub_date=timezone.now())
+
+        expected = P._reduce_many([a, b])
+        calls.clear()
+        self.assertEqual(P._reduce_cached([a, b]), expected)
+        self.assertEqual(calls, [a.pk, b.pk])
+        # Only misses are reduced
+        calls.clear()
+        c = models.Poll.objects.create(question='c', pub_date=timezone.now())
+        self.assertEqual(P._reduce_cached([a, b, c]), expected + [{'question': 'c', 'counted': c.pk}])
+        self.assertEqual(calls, [c.pk])
+
+        # Saving invalidates
+        a.question = 'A'
+        a.save()
+        calls.clear()
+        self.assertEqual(P._reduce_cached([a, b])[0]['question'], 'A')
+        self.assertEqual(calls, [a.pk])
+
+        # Context bypasses the cache
+        calls.clear()
+        P._reduce_cached([a, b], extra=1)
+        self.assertEqual(calls, [a.pk, b.pk])
+
+    def test_invalidate_reduce_cache_many(self):
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ['question']
+                cache = 'default'
+
+        caches['default'].clear()
+        polls = [models.Poll.objects.create(question=q, pub_date=timezone.now()) for q in 'ab']
+        P._reduce_cached(polls)
+
+        models.Poll.objects.update(question='c')
+        invalidate_reduce_cache_many(models.Poll, models.Poll.objects.filter(pk=polls[0].pk))
+        polls = models.Poll.objects.order_by('pk')
+        self.assertEqual(P._reduce_cached(polls), [{'question': 'c'}, {'question': 'b'}])
+
+    def test_invalidate_on_commit(self):
+
+        class P(ModelMapper):
+            class Meta:
+                model = models.Poll
+                fields = ['question']
+                cache = 'default'
+
+        caches['default'].clear()
+        poll = models.Poll.objects.create(question='a', pub_date=timezone.now())
+        key = P._cache_key(poll)
+        P._reduce_cached([poll])
+
+        with transaction.atomic():
+            poll.question = 'b'
+            poll.save()
+            invalidate_reduce_cache_many(models.Poll, [poll])
+            # Not removed until the transaction commits.
+            self.assertIn(key, caches['default'])
+        self.assertNotIn(key, caches['default'])
+
+        P._reduce_cached([poll])
+        try:
+            with transaction.atomic():
+                poll.save()
+                invalidate_reduce_cache_many(models.Poll, [poll])
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertIn(key, caches['default'])
@@ -1,8 +1,24 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib.util import find_spec
+from unittest import skipUnless
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 import json
 from nap.http import STATUS
+from nap.mapper import ModelMapper
+from nap.rest.pagination import encode_cursor
 
-from .models import Poll, Choice
+from .models import Choice, Poll, Survey, Tag, Topic
+from .rest_views import (
+    BulkChoiceListView, BulkPollListView, BulkSurveyListView, CachedPollListView, CachedSinglePollView,
+    ChoiceListView, ChoiceMapper, CursorPollListView, PollListView, PollMapper, SinglePollView,
+    StreamingPollListView,
+)
 
 
 class ListRestViewTest(TestCase):
@@ -30,6 +46,50 @@ class ListRestViewTest(TestCase):
         self.assertEqual(data[0], dict(self.question_1, choices=[]))
         self.assertEqual(data[1], dict(self.question_2, choices=[]))
 
+    def test_get_values_many_to_many(self):
+        poll = Poll.objects.get(question='Question 1')
+        poll.tags.add(Tag.objects.create(name='a'), Tag.objects.create(name='b'))
+        response = self.client.get('/rest/polls/tagged/')
+        self.assertEqual(response.status_code, STATUS.OK)
+        data = json.loads(response.content.decode())
+        self.assertEqual(len(data), 2)
+        self.assertEqual(sorted(data[0]['tags']), sorted(poll.tags.values_list('pk', flat=True)))
+
+    def test_get_query_plan(self):
+        for poll in Poll.objects.all():
+            Choice.objects.create(poll=poll, choice_text='A')
+            Choice.objects.create(poll=poll, choice_text='B')
+
+        # One query for polls, and one for all their choices.
+        with self.assertNumQueries(2):
+            response = self.client.get('/rest/polls/')
+        data = json.loads(response.getvalue().decode())
+        self.assertEqual([len(row['choices']) for row in data], [2, 2])
+
+    def test_get_streaming(self):
+        for poll in Poll.objects.all():
+            Choice.objects.create(poll=poll, choice_text='A')
+
+        expected = self.client.get('/rest/polls/')
+
+        # One query for polls, and one for the choices of each chunk.
+        with self.assertNumQueries(3):
+            response = self.client.get('/rest/polls/streaming/')
+            self.assertTrue(response.streaming)
+            content = b''.join(response.streaming_content)
+        self.assertEqual(json.loads(content.decode()), json.loads(expected.getvalue().decode()))
+
+    def test_get_columnar(self):
+        response = self.client.get('/rest/polls/columnar/')
+        self.assertEqual(response.status_code, STATUS.OK)
+
+        data = json.loads(response.getvalue().decode())
+        rows = [dict(zip(data['fields'], row)) for row in data['rows']]
+        self.assertEqual(rows, [
+            PollMapper() << poll
+            for poll in Poll.objects.all()
+        ])
+
     def test_post(self):
         request_data = {}
         response = self.client.post('/rest/polls/',
@@ -63,6 +123,569 @@ class ListRestViewTest(TestCase):
         self.assertEqual(data, dict(request_data, choices=[]))
 
 
+class FormatTest(TestCase):
+
+    def setUp(self):
+        self.question = {
+            'question': 'Question 1',
+            'pub_date': '2016-05-13 00:00:00',
+            'kill_date': None,
+        }
+        Poll.objects.create(**self.question)
+
+    def test_json(self):
+        response = self.client.get('/rest/polls/', HTTP_ACCEPT='application/json, application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('Accept', response['Vary'])
+
+    @skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+    def test_msgpack(self):
+        import msgpack
+        response = self.client.get('/rest/polls/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content, raw=False), [dict(self.question, choices=[])])
+
+        data = dict(self.question, question='Question 2')
+        response = self.client.post('/rest/polls/', msgpack.packb(data), content_type='application/msgpack')
+        self.assertEqual(response.status_code, STATUS.CREATED)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content.decode()), dict(data, choices=[]))
+
+        response = self.client.post('/rest/polls/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, STATUS.BAD_REQUEST)
+
+    @skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+    def test_msgpack_streaming(self):
+        import msgpack
+        # Only JSON is streamed, so MessagePack responses are built in full.
+        view = StreamingPollListView.as_view(conditional=True)
+        response = view(RequestFactory().get('/', HTTP_ACCEPT='application/msgpack'))
+        self.assertFalse(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content, raw=False), [dict(self.question, choices=[])])
+        response = view(RequestFactory().get('/', HTTP_ACCEPT='application/msgpack',
+                                             HTTP_IF_NONE_MATCH=response['ETag']))
+        self.assertEqual(response.status_code, STATUS.NOT_MODIFIED)
+
+        response = view(RequestFactory().get('/'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+class CursorPaginationTest(TestCase):
+
+    def setUp(self):
+        for day in range(1, 6):
+            Poll.objects.create(question='Question %d' % day, pub_date='2016-05-%02d 00:00:00' % day)
+        # Same pub_date, so the pk decides the order.
+        Poll.objects.create(question='Question 5b', pub_date='2016-05-05 00:00:00')
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, STATUS.OK)
+        data = json.loads(response.getvalue().decode())
+        return data['meta'], [row['question'] for row in data['data']]
+
+    def test_pages(self):
+        meta, questions = self.get('/rest/polls/cursor/')
+        self.assertEqual(questions, ['Question 5', 'Question 5b'])
+        self.assertIsNone(meta['prev'])
+        self.assertNotIn('total', meta)
+
+        meta, questions = self.get(meta['next_url'])
+        self.assertEqual(questions, ['Question 4', 'Question 3'])
+
+        meta, questions = self.get(meta['next_url'])
+        self.assertEqual(questions, ['Question 2', 'Question 1'])
+        self.assertIsNone(meta['next'])
+
+        meta, questions = self.get(meta['prev_url'])
+        self.assertEqual(questions, ['Question 4', 'Question 3'])
+
+        meta, questions = self.get(meta['prev_url'])
+        self.assertEqual(questions, ['Question 5', 'Question 5b'])
+        self.assertIsNone(meta['prev'])
+        self.assertIsNotNone(meta['next'])
+
+    def test_bad_cursor(self):
+        response = self.client.get('/rest/polls/cursor/?cursor=bad')
+        self.assertEqual(response.status_code, STATUS.BAD_REQUEST)
+
+        # Cursors which decode, but hold values of the wrong type.
+        for values in (['garbage', '1'], ['2020-01-03 00:00:00', 'x'], [None, None], [{}, 1]):
+            response = self.client.get('/rest/polls/cursor/', {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, STATUS.BAD_REQUEST, values)
+
+    def test_related_ordering(self):
+        view = CursorPollListView.as_view(ordering=('choice__votes',))
+        with self.assertRaises(ImproperlyConfigured):
+            view(RequestFactory().get('/'))
+
+
+class CountStrategyTest(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        for day in range(1, 6):
+            Poll.objects.create(question='Question %d' % day, pub_date='2016-05-%02d 00:00:00' % day)
+
+    def get_meta(self, page=1, **kwargs):
+        view = PollListView.as_view(paginate_by=2, ordering=('pk',), **kwargs)
+        response = view(RequestFactory().get('/rest/polls/', {'page': page}))
+        self.assertEqual(response.status_code, STATUS.OK)
+        return json.loads(response.getvalue().decode())['meta']
+
+    def test_exact(self):
+        self.assertEqual(self.get_meta(), {'offset': 0, 'page': 1, 'total': 5})
+
+    def test_none(self):
+        with self.assertNumQueries(2):
+            meta = self.get_meta(count_strategy='none')
+        self.assertEqual(meta, {'offset': 0, 'page': 1, 'has_next': True})
+        meta = self.get_meta(3, count_strategy='none')
+        self.assertEqual(meta, {'offset': 4, 'page': 3, 'has_next': False})
+
+    def test_capped(self):
+        meta = self.get_meta(count_strategy='capped', count_limit=3)
+        self.assertEqual(meta, {'offset': 0, 'page': 1, 'has_next': True, 'total': 3, 'total_capped': True})
+        meta = self.get_meta(count_strategy='capped', count_limit=5)
+        self.assertEqual(meta, {'offset': 0, 'page': 1, 'has_next': True, 'total': 5})
+
+    def test_cached(self):
+        meta = self.get_meta(count_strategy='cached')
+        self.assertEqual(meta['total'], 5)
+        Poll.objects.create(question='Question 6', pub_date='2016-05-06 00:00:00')
+        meta = self.get_meta(count_strategy='cached')
+        self.assertEqual(meta['total'], 5)
+        caches['default'].clear()
+        meta = self.get_meta(count_strategy='cached')
+        self.assertEqual(meta['total'], 6)
+
+    def test_cached_empty(self):
+        queryset = Poll.objects.filter(pk__in=[])
+        with self.assertNumQueries(0):
+            meta = self.get_meta(count_strategy='cached', queryset=queryset)
+        self.assertEqual(meta, {'offset': 0, 'page': 1, 'has_next': False, 'total': 0})
+
+
+class BulkPostTest(TestCase):
+
+    def setUp(self):
+        self.tags = [Tag.objects.create(name='a'), Tag.objects.create(name='b')]
+
+    def post(self, data):
+        return self.client.post('/rest/polls/bulk/', json.dumps(data), content_type='application/json')
+
+    def test_create(self):
+        data = [
+            {'question': 'Question %d' % idx, 'pub_date': '2016-05-13 00:00:00'}
+            for idx in range(5)
+        ]
+        data[1]['tags'] = [tag.pk for tag in self.tags]
+        data[2]['tags'] = [str(self.tags[0].pk)]
+        # Check tags, insert polls and tags, then prefetch choices and tags.
+        inserts = 1 if connection.features.can_return_rows_from_bulk_insert else len(data)
+        with self.assertNumQueries(6 + inserts):
+            response = self.post(data)
+        self.assertEqual(response.status_code, STATUS.CREATED)
+        result = json.loads(response.content.decode())
+        self.assertEqual([item['question'] for item in result], [item['question'] for item in data])
+
+        polls = list(Poll.objects.order_by('pk'))
+        self.assertEqual([poll.question for poll in polls], [item['question'] for item in data])
+        self.assertEqual(set(polls[1].tags.all()), set(self.tags))
+        self.assertEqual(list(polls[2].tags.all()), self.tags[:1])
+        self.assertFalse(polls[0].tags.exists())
+
+    def test_errors(self):
+        response = self.post([
+            {'question': 'Question 1', 'pub_date': '2016-05-13 00:00:00'},
+            {'pub_date': '2016-05-13 00:00:00'},
+            'nope',
+            {'question': 'Question 4', 'pub_date': '2016-05-13 00:00:00', 'tags': [0, 'x', self.tags[0].pk]},
+        ])
+        self.assertEqual(response.status_code, STATUS.BAD_REQUEST)
+        errors = json.loads(response.content.decode())
+        self.assertEqual(sorted(errors), ['1', '2', '3'])
+        self.assertIn('question', errors['1'])
+        self.assertEqual(len(errors['3']['tags']), 2)
+        self.assertFalse(Poll.objects.exists())
+
+    def test_single(self):
+        response = self.post({'question': 'Question 1', 'pub_date': '2016-05-13 00:00:00'})
+        self.assertEqual(response.status_code, STATUS.CREATED)
+        self.assertEqual(Poll.objects.count(), 1)
+
+    def test_through(self):
+        topics = [Topic.objects.create(code='x'), Topic.objects.create(code='y')]
+        response = self.client.post('/rest/surveys/bulk/', json.dumps([
+            {'title': 'A', 'topics': ['x', 'y'], 'tags': [self.tags[0].pk]},
+            {'title': 'B', 'topics': ['y'], 'tags': [tag.pk for tag in self.tags]},
+        ]), content_type='application/json')
+        self.assertEqual(response.status_code, STATUS.CREATED)
+        a, b = Survey.objects.order_by('title')
+        self.assertEqual(set(a.topics.all()), set(topics))
+        self.assertEqual(list(b.topics.all()), topics[1:])
+        # Custom through models are used as well.
+        self.assertEqual(list(a.tags.all()), self.tags[:1])
+        self.assertEqual(set(b.tags.all()), set(self.tags))
+
+    def test_duplicate_unique(self):
+        Survey.objects.create(title='Existing')
+        response = self.client.post('/rest/surveys/bulk/', json.dumps([
+            {'title': 'A'},
+            {'title': 'B'},
+            {'title': 'A'},
+            {'title': 'Existing'},
+        ]), content_type='application/json')
+        self.assertEqual(response.status_code, STATUS.BAD_REQUEST)
+        errors = json.loads(response.content.decode())
+        self.assertEqual(sorted(errors), ['2', '3'])
+        self.assertIn('title', errors['2'])
+        self.assertEqual(Survey.objects.count(), 1)
+
+
+class BulkPatchTest(TestCase):
+
+    def setUp(self):
+        self.polls = [
+            Poll.objects.create(question='Question %d' % idx, pub_date='2016-05-13 00:00:00')
+            for idx in range(3)
+        ]
+
+    def patch(self, data):
+        return self.client.patch('/rest/polls/bulk/', json.dumps(data), content_type='application/json')
+
+    def test_patch(self):
+        a, b, c = self.polls
+        data = [
+            {'pk': a.pk, 'question': 'A'},
+            {'id': b.pk, 'question': 'B', 'kill_date': '2016-06-13 00:00:00'},
+            {'pk': c.pk, 'question': c.question},
+        ]
+        # Fetch with prefetches, then one update for each set of changed fields.
+        with self.assertNumQueries(7):
+            response = self.patch(data)
+        self.assertEqual(response.status_code, STATUS.OK)
+        result = json.loads(response.content.decode())
+        self.assertEqual([item['question'] for item in result], ['A', 'B', c.question])
+
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual(a.question, 'A')
+        self.assertEqual(b.question, 'B')
+        self.assertIsNotNone(b.kill_date)
+
+    def test_errors(self):
+        a, b, c = self.polls
+        response = self.patch([
+            {'pk': a.pk, 'question': 'A'},
+            {'pk': 0, 'question': 'B'},
+            {'question': 'C'},
+            {'pk': c.pk, 'pub_date': 'never'},
+        ])
+        self.assertEqual(response.status_code, STATUS.BAD_REQUEST)
+        errors = json.loads(response.content.decode())
+        self.assertEqual(sorted(errors), ['1', '2', '3'])
+        self.assertIn('pub_date', errors['3'])
+        a.refresh_from_db()
+        self.assertEqual(a.question, 'Question 0')
+
+        response = self.patch({'pk': a.pk})
+        self.assertEqual(response.status_code, STATUS.BAD_REQUEST)
+
+    def test_auto_now(self):
+        old = timezone.now() - timedelta(days=1)
+        a, b = Survey.objects.create(title='A'), Survey.objects.create(title='B')
+        Survey.objects.update(updated=old)
+        response = self.client.patch('/rest/surveys/bulk/', json.dumps([
+            {'pk': a.pk, 'title': 'Changed'},
+            {'pk': b.pk, 'title': 'B'},
+        ]), content_type='application/json')
+        self.assertEqual(response.status_code, STATUS.OK)
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertGreater(a.updated, old)
+        # Unchanged objects are not saved
+        self.assertEqual(b.updated, old)
+
+
+class BulkDeleteTest(TestCase):
+
+    def setUp(self):
+        self.polls = [
+            Poll.objects.create(question='Question %d' % idx, pub_date='2016-05-1%d 00:00:00' % idx)
+            for idx in range(4)
+        ]
+        for poll in self.polls:
+            Choice.objects.create(poll=poll, choice_text='Yes')
+
+    def delete(self, url, data=None):
+        data = '' if data is None else json.dumps(data)
+        response = self.client.delete(url, data, content_type='application/json')
+        if response.status_code != STATUS.OK:
+            return response.status_code, None
+        return response.status_code, json.loads(response.content.decode())
+
+    def test_pks(self):
+        a, b, c, d = self.polls
+        status, data = self.delete('/rest/polls/bulk/', [a.pk, b.pk, 0])
+        self.assertEqual(status, STATUS.OK)
+        self.assertEqual(data, {'count': 2})
+        self.assertEqual(list(Poll.objects.order_by('pk')), [c, d])
+        # Cascades are still followed
+        self.assertEqual(Choice.objects.count(), 2)
+
+        status, data = self.delete('/rest/polls/bulk/', ['x'])
+        self.assertEqual(status, STATUS.BAD_REQUEST)
+
+    def test_filter(self):
+        status, data = self.delete('/rest/polls/bulk/')
+        self.assertEqual(status, STATUS.BAD_REQUEST)
+        # Only permitted fields are used
+        status, data = self.delete('/rest/polls/bulk/?kill_date=2016-05-12')
+        self.assertEqual(status, STATUS.BAD_REQUEST)
+        status, data = self.delete('/rest/polls/bulk/?pub_date__lt=never')
+        self.assertEqual(status, STATUS.BAD_REQUEST)
+
+        status, data = self.delete('/rest/polls/bulk/?pub_date__lt=2016-05-12')
+        self.assertEqual(data, {'count': 2})
+        status, data = self.delete('/rest/polls/bulk/?question=Question+3')
+        self.assertEqual(data, {'count': 1})
+        self.assertEqual(list(Poll.objects.all()), [self.polls[2]])
+
+    def test_raw(self):
+        pks = list(Choice.objects.values_list('pk', flat=True)[:3])
+        with CaptureQueriesContext(connection) as ctx:
+            status, data = self.delete('/rest/choices/bulk/', pks)
+        self.assertEqual(data, {'count': 3})
+        # A single DELETE, plus a SELECT only if Choice has cached mappers
+        self.assertEqual(sum(q['sql'].startswith('DELETE') for q in ctx.captured_queries), 1)
+        self.assertEqual(Choice.objects.count(), 1)
+
+
+class VersionedPollMapper(PollMapper):
+    class Meta(PollMapper.Meta):
+        version = 'pub_date'
+
+
+class CachedPollMapper(ModelMapper):
+    class Meta(PollMapper.Meta):
+        cache = 'default'
+
+
+class CachedChoiceMapper(ChoiceMapper):
+    class Meta(ChoiceMapper.Meta):
+        cache = 'default'
+
+
+class CachedSurveyMapper(ModelMapper):
+    class Meta:
+        model = Survey
+        fields = ['title']
+        version = 'updated'
+        cache = 'default'
+
+
+class ReduceCacheTest(TransactionTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.poll = Poll.objects.create(question='Question 1', pub_date='2016-05-13 00:00:00')
+
+    def get(self, view, **kwargs):
+        request = RequestFactory().get('/')
+        response = view.as_view(mapper_class=CachedPollMapper)(request, **kwargs)
+        self.assertEqual(response.status_code, STATUS.OK)
+        return json.loads(response.content.decode())
+
+    def test_list(self):
+        data = self.get(PollListView)
+        key = CachedPollMapper._cache_key(self.poll)
+        self.assertEqual(caches['default'].get(key), data[0])
+
+        caches['default'].set(key, {'cached': True})
+        self.assertEqual(self.get(PollListView), [{'cached': True}])
+        self.assertEqual(self.get(SinglePollView, pk=self.poll.pk), {'cached': True})
+
+        self.poll.save()
+        self.assertEqual(self.get(PollListView), data)
+
+    def test_version_column(self):
+        for idx in range(5):
+            Survey.objects.create(title=str(idx))
+        view = BulkSurveyListView.as_view(mapper_class=CachedSurveyMapper)
+        # The version is selected with the other columns, for the cache key.
+        with self.assertNumQueries(1):
+            response = view(RequestFactory().get('/'))
+        self.assertEqual(len(json.loads(response.content.decode())), 5)
+        with self.assertNumQueries(1):
+            view(RequestFactory().get('/'))
+
+    def test_bulk_patch(self):
+        self.assertEqual(self.get(PollListView)[0]['question'], 'Question 1')
+
+        request = RequestFactory().patch('/', json.dumps([{'pk': self.poll.pk, 'question': 'Patched'}]),
+                                         content_type='application/json')
+        response = BulkPollListView.as_view(mapper_class=CachedPollMapper)(request)
+        self.assertEqual(response.status_code, STATUS.OK)
+        self.assertEqual(self.get(PollListView)[0]['question'], 'Patched')
+
+        # Cached entries are only removed once the transaction commits.
+        key = CachedPollMapper._cache_key(self.poll)
+        request = RequestFactory().patch('/', json.dumps([{'pk': self.poll.pk, 'question': 'Again'}]),
+                                         content_type='application/json')
+        with transaction.atomic():
+            BulkPollListView.as_view(mapper_class=CachedPollMapper)(request)
+            self.assertIn(key, caches['default'])
+        self.assertNotIn(key, caches['default'])
+
+    def test_raw_delete(self):
+        choice = Choice.objects.create(poll=self.poll, choice_text='Choice', votes=0)
+        key = CachedChoiceMapper._cache_key(choice)
+        self.assertEqual(CachedChoiceMapper._reduce_cached([choice])[0]['choice_text'], 'Choice')
+        self.assertIn(key, caches['default'])
+
+        request = RequestFactory().delete('/', json.dumps([choice.pk]), content_type='application/json')
+        response = BulkChoiceListView.as_view(mapper_class=CachedChoiceMapper)(request)
+        self.assertEqual(response.status_code, STATUS.OK)
+        self.assertNotIn(key, caches['default'])
+
+
+class ResponseCacheTest(TransactionTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.poll = Poll.objects.create(question='Question 1', pub_date='2016-05-13 00:00:00')
+        self.detail_url = '/rest/polls/{}/cached/'.format(self.poll.pk)
+
+    def test_get(self):
+        response = self.client.get('/rest/polls/cached/')
+        self.assertIn('Accept', response['Vary'])
+        content = response.content
+
+        Poll.objects.update(question='Question 2')
+        with self.assertNumQueries(0):
+            response = self.client.get('/rest/polls/cached/')
+        self.assertEqual(response.status_code, STATUS.OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, content)
+
+        # Query string and vary headers are part of the key
+        response = self.client.get('/rest/polls/cached/?x=1')
+        self.assertNotEqual(response.content, content)
+        response = self.client.get('/rest/polls/cached/', HTTP_ACCEPT='text/json')
+        self.assertNotEqual(response.content, content)
+
+    def test_invalidate(self):
+        list_content = self.client.get('/rest/polls/cached/').content
+        self.client.get(self.detail_url)
+
+        response = self.client.patch(self.detail_url, json.dumps({'question': 'Patched'}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, STATUS.OK)
+        self.assertEqual(json.loads(self.client.get(self.detail_url).content.decode())['question'], 'Patched')
+        self.assertNotEqual(self.client.get('/rest/polls/cached/').content, list_content)
+
+        response = self.client.post('/rest/polls/cached/', json.dumps({
+            'question': 'New', 'pub_date': '2016-05-14 00:00:00',
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, STATUS.CREATED)
+        self.assertEqual(len(json.loads(self.client.get('/rest/polls/cached/').content.decode())), 2)
+
+        self.client.delete(self.detail_url)
+        self.assertEqual(self.client.get(self.detail_url).status_code, STATUS.NOT_FOUND)
+
+    def test_invalidate_on_commit(self):
+        list_content = self.client.get('/rest/polls/cached/').content
+        view = CachedPollListView()
+
+        with transaction.atomic():
+            Poll.objects.update(question='Updated')
+            view.invalidate_response_cache()
+            # Not invalidated until the transaction commits.
+            self.assertEqual(self.client.get('/rest/polls/cached/').content, list_content)
+        self.assertNotEqual(self.client.get('/rest/polls/cached/').content, list_content)
+
+        list_content = self.client.get('/rest/polls/cached/').content
+        try:
+            with transaction.atomic():
+                Poll.objects.update(question='Rolled back')
+                view.invalidate_response_cache()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/rest/polls/cached/').content, list_content)
+
+    def test_conditional(self):
+        view = CachedSinglePollView.as_view(conditional=True)
+        response = view(RequestFactory().get('/'), pk=self.poll.pk)
+        etag = response['ETag']
+
+        # Cached responses still honour conditional requests.
+        with self.assertNumQueries(0):
+            response = view(RequestFactory().get('/', HTTP_IF_NONE_MATCH=etag), pk=self.poll.pk)
+        self.assertEqual(response.status_code, STATUS.NOT_MODIFIED)
+
+
+class ConditionalTest(TestCase):
+
+    def setUp(self):
+        self.poll = Poll.objects.create(question='Question 1', pub_date='2016-05-13 00:00:00')
+
+    def get(self, view, **headers):
+        factory = RequestFactory()
+        if view is SinglePollView:
+            return view.as_view(conditional=True, **self.initkwargs)(factory.get('/', **headers), pk=self.poll.pk)
+        return view.as_view(conditional=True, **self.initkwargs)(factory.get('/', **headers))
+
+    def check(self, view):
+        response = self.get(view)
+        self.assertEqual(response.status_code, STATUS.OK)
+        etag = response['ETag']
+
+        response = self.get(view, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, STATUS.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        Poll.objects.filter(pk=self.poll.pk).update(question='Question 2', pub_date='2016-05-14 00:00:00')
+        response = self.get(view, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, STATUS.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_content_hash(self):
+        self.initkwargs = {}
+        self.check(SinglePollView)
+
+    def test_content_hash_list(self):
+        self.initkwargs = {}
+        self.check(PollListView)
+
+    def test_version(self):
+        self.initkwargs = {'mapper_class': VersionedPollMapper}
+        response = self.check(SinglePollView)
+        self.assertIn('Last-Modified', response)
+
+        response = self.get(SinglePollView, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, STATUS.NOT_MODIFIED)
+
+    def test_version_list(self):
+        self.initkwargs = {'mapper_class': VersionedPollMapper}
+        response = self.get(PollListView)
+        # Only the version is fetched for a current copy.
+        with self.assertNumQueries(1):
+            response = self.get(PollListView, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, STATUS.NOT_MODIFIED)
+        response = self.check(PollListView)
+        # Removing an object would not change the latest version
+        self.assertNotIn('Last-Modified', response)
+        response = self.get(PollListView, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2050 00:00:00 GMT')
+        self.assertEqual(response.status_code, STATUS.OK)
+
+
 class SingleObjectRestViewTest(TestCase):
 
     def setUp(self):
@@ -163,6 +786,24 @@ class SingleObjectRestViewTest(TestCase):
         self.assertEqual(poll.question, request_data['question'])
         self.assertEqual(poll.pub_date.isoformat(' '), request_data['pub_date'])
 
+    def test_patch_changed_only(self):
+        url = '/rest/polls/{}'.format(self.poll.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(url, json.dumps({'question': 'Changed'}),
+                                         content_type='application/json')
+        self.assertEqual(response.status_code, STATUS.OK)
+        updates = [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"question"', updates[0])
+        self.assertNotIn('"pub_date"', updates[0])
+
+        # No changes, no save
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(url, json.dumps({'question': 'Changed'}),
+                                         content_type='application/json')
+        self.assertEqual(response.status_code, STATUS.OK)
+        self.assertFalse([query for query in ctx.captured_queries if query['sql'].startswith('UPDATE')])
+
     def test_delete(self):
         response = self.client.delete('/rest/polls/{}'.format(self.poll.pk))
         self.assertEqual(response.status_code, STATUS.NO_CONTENT)
@@ -192,6 +833,16 @@ class ChoiceListViewTest(TestCase):
                                     content_type='application/json')
         self.assertEqual(response.status_code, 201)
 
+    def test_post_bulk(self):
+        other = Poll.objects.create(**self.question_data)
+        data = [{'choice_text': 'Choice %d' % idx, 'poll': other.pk} for idx in range(2)]
+        request = RequestFactory().post('/', json.dumps(data), content_type='application/json')
+        response = ChoiceListView.as_view(allow_bulk=True)(request, poll_id=str(self.poll.pk))
+        self.assertEqual(response.status_code, STATUS.CREATED)
+        # prepare_object is called for each object
+        self.assertEqual(self.poll.choice_set.count(), 2)
+        self.assertFalse(other.choice_set.exists())
+
     def test_paginate(self):
         choices = [
             Choice.objects.create(poll=self.poll),
@@ -199,3 +850,16 @@ class ChoiceListViewTest(TestCase):
         ]
         response = self.client.get('/rest/polls/{}/choice/'.format(self.poll.pk))
         self.assertEqual(response.status_code, 200)
+        data = json.loads(response.getvalue().decode())
+        self.assertEqual(data['data'], [ChoiceMapper() << choices[0]])
+
+        # The values_list() path gives the same output, without model instances.
+        with self.assertNumQueries(2):
+            response = self.client.get('/rest/polls/{}/choice/values/'.format(self.poll.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.getvalue().decode()), data)
+
+        response = self.client.get('/rest/polls/{}/choice/streaming/'.format(self.poll.pk))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertEqual(json.loads(content.decode()), data)
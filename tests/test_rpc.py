@@ -1,21 +1,28 @@
+import asyncio
+from importlib.util import find_spec
+from types import SimpleNamespace
+from unittest import skipUnless
+
 from django.test import TestCase, LiveServerTestCase
 
 from nap.http import STATUS
 from nap.rpc import client
 
+from .models import Tag
+
 import json
 
 
 class RPCTest(TestCase):
 
-    def call(self, data=None, action='echo', content_type='application/json', **kwargs):
+    def call(self, data=None, action='echo', content_type='application/json', path='/rpc/', **kwargs):
         if action is not None:
             kwargs['HTTP_X_RPC_ACTION'] = action
         if content_type is not None:
             kwargs['content_type'] = content_type
         if data is not None:
             kwargs['data'] = data
-        return self.client.post('/rpc/', **kwargs)
+        return self.client.post(path, **kwargs)
 
     def test_options(self):
         r = self.client.options('/rpc/')
@@ -23,6 +30,38 @@ class RPCTest(TestCase):
         data = json.loads(r.content.decode())
         self.assertTrue('echo' in data)
 
+    def test_introspect(self):
+        r = self.client.options('/rpc/batch/')
+        data = json.loads(r.content.decode())
+        self.assertEqual(data['add'], {'args': ['a', 'b'], 'doc': None, 'defaults': None})
+        self.assertEqual(data['echo'], {'args': [], 'doc': None, 'defaults': None})
+
+    def test_registry(self):
+        from . import rpc_views
+        registry = rpc_views.BatchView._rpc_methods()
+        self.assertIs(rpc_views.BatchView._rpc_methods(), registry)
+        self.assertEqual(set(registry), {'add', 'close', 'double', 'echo', 'fail', 'flaky', 'tag'})
+        self.assertEqual(set(rpc_views.View._rpc_methods()), {'close', 'echo'})
+
+    def test_bad_arguments(self):
+        r = self.call(json.dumps({'a': 1}), action='add', path='/rpc/batch/')
+        self.assertEqual(r.status_code, STATUS.BAD_REQUEST)
+        r = self.call(json.dumps({'a': 1, 'b': 2, 'c': 3}), action='add', path='/rpc/batch/')
+        self.assertEqual(r.status_code, STATUS.BAD_REQUEST)
+
+    def test_vary(self):
+        r = self.call('{}')
+        self.assertEqual(r['Content-Type'], 'application/json')
+        self.assertIn('Accept', r['Vary'])
+
+    @skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+    def test_msgpack(self):
+        import msgpack
+        r = self.call(msgpack.packb({'foo': 'bar'}), content_type='application/msgpack',
+                      HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(r['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(r.content, raw=False), {'foo': 'bar'})
+
     def test_body_omitted(self):
         r = self.call(None)
         self.assertEqual(r.content.decode('utf-8'), '{}')
@@ -60,6 +99,143 @@ class RPCTest(TestCase):
         self.assertEqual(r.status_code, STATUS.PRECONDITION_FAILED)
 
 
+class RPCBatchTest(TestCase):
+
+    def batch(self, calls, url='/rpc/batch/'):
+        return self.client.post(url, json.dumps(calls), content_type='application/json', HTTP_X_RPC_BATCH='1')
+
+    def test_batch(self):
+        r = self.batch([
+            {'id': 'a', 'action': 'add', 'params': {'a': 1, 'b': 2}},
+            {'id': 'b', 'action': 'echo', 'params': {'x': 'y'}},
+            {'id': 'c', 'action': 'echo'},
+        ])
+        self.assertEqual(r.status_code, STATUS.OK)
+        self.assertEqual(json.loads(r.content.decode()), [
+            {'id': 'a', 'result': 3},
+            {'id': 'b', 'result': {'x': 'y'}},
+            {'id': 'c', 'result': {}},
+        ])
+
+    def test_batch_errors(self):
+        r = self.batch([
+            {'id': 1, 'action': 'add', 'params': {'a': 1}},
+            {'id': 2, 'action': 'missing'},
+            {'id': 3, 'action': 'fail'},
+            {'id': 4, 'action': 'tag', 'params': {'name': 'one'}},
+            'not a call',
+        ])
+        data = json.loads(r.content.decode())
+        self.assertEqual([result['id'] for result in data], [1, 2, 3, 4, None])
+        self.assertEqual(data[0]['error']['status'], STATUS.BAD_REQUEST)
+        self.assertEqual(data[1]['error']['status'], STATUS.PRECONDITION_FAILED)
+        self.assertEqual(data[2]['error'], {'status': STATUS.BAD_REQUEST, 'message': 'Failed.'})
+        self.assertIn('result', data[3])
+        self.assertEqual(data[4]['error']['status'], STATUS.BAD_REQUEST)
+        self.assertTrue(Tag.objects.filter(name='one').exists())
+
+    def test_batch_atomic(self):
+        r = self.batch([
+            {'id': 1, 'action': 'tag', 'params': {'name': 'one'}},
+            {'id': 2, 'action': 'fail'},
+            {'id': 3, 'action': 'tag', 'params': {'name': 'two'}},
+        ], url='/rpc/atomic/')
+        data = json.loads(r.content.decode())
+        self.assertIn('result', data[0])
+        self.assertEqual(data[1]['error']['status'], STATUS.BAD_REQUEST)
+        self.assertEqual(data[2]['error']['status'], STATUS.FAILED_DEPENDENCY)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_batch_atomic_invalid(self):
+        r = self.batch([
+            {'id': 1, 'action': 'tag', 'params': {'name': 'one'}},
+            {'id': 2, 'action': 'add', 'params': {}},
+        ], url='/rpc/atomic/')
+        data = json.loads(r.content.decode())
+        self.assertEqual(data[0]['error']['status'], STATUS.FAILED_DEPENDENCY)
+        self.assertEqual(data[1]['error']['status'], STATUS.BAD_REQUEST)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_batch_invalid(self):
+        r = self.batch({'action': 'echo'})
+        self.assertEqual(r.status_code, STATUS.BAD_REQUEST)
+        r = self.batch([{'action': 'echo'}] * 6)
+        self.assertEqual(r.status_code, STATUS.REQUEST_ENTITY_TOO_LARGE)
+
+    def test_batch_not_permitted(self):
+        r = self.batch([{'action': 'echo'}], url='/rpc/')
+        self.assertEqual(r.status_code, STATUS.METHOD_NOT_ALLOWED)
+
+
+class AsyncRPCTest(TestCase):
+
+    def call(self, data, action, path='/rpc/async/'):
+        return self.client.post(path, json.dumps(data), content_type='application/json', HTTP_X_RPC_ACTION=action)
+
+    def batch(self, calls, path='/rpc/async/'):
+        return self.client.post(path, json.dumps(calls), content_type='application/json', HTTP_X_RPC_BATCH='1')
+
+    def test_sync_method(self):
+        r = self.call({'foo': 'bar'}, 'echo')
+        self.assertEqual(json.loads(r.content.decode()), {'foo': 'bar'})
+
+    def test_async_method(self):
+        r = self.call({'foo': 'bar'}, 'async_echo')
+        self.assertEqual(json.loads(r.content.decode()), {'foo': 'bar'})
+        r = self.batch([{'id': 1, 'action': 'double', 'params': {'value': 2}}])
+        self.assertEqual(json.loads(r.content.decode()), [{'id': 1, 'result': 4}])
+
+    def test_async_method_sync_view(self):
+        r = self.batch([{'id': 1, 'action': 'double', 'params': {'value': 2}}], path='/rpc/batch/')
+        self.assertEqual(json.loads(r.content.decode()), [{'id': 1, 'result': 4}])
+
+    def test_errors(self):
+        r = self.call({}, 'missing')
+        self.assertEqual(r.status_code, STATUS.PRECONDITION_FAILED)
+        r = self.call({}, 'double')
+        self.assertEqual(r.status_code, STATUS.BAD_REQUEST)
+        r = self.client.post('/rpc/async/', 'not json', content_type='application/json', HTTP_X_RPC_ACTION='echo')
+        self.assertEqual(r.status_code, STATUS.BAD_REQUEST)
+
+    def test_not_rpc(self):
+        r = self.client.post('/rpc/async/', '{}', content_type='application/json')
+        self.assertEqual(r.status_code, STATUS.METHOD_NOT_ALLOWED)
+
+    def test_batch_sequential(self):
+        r = self.batch([
+            {'id': 1, 'action': 'wait'},
+            {'id': 2, 'action': 'release'},
+            {'id': 3, 'action': 'tag', 'params': {'name': 'one'}},
+        ])
+        data = json.loads(r.content.decode())
+        self.assertEqual(data[0]['error']['status'], STATUS.REQUEST_TIMEOUT)
+        self.assertEqual(data[1], {'id': 2, 'result': 'released'})
+        self.assertIn('result', data[2])
+        self.assertTrue(Tag.objects.filter(name='one').exists())
+
+    def test_batch_concurrent(self):
+        r = self.batch([
+            {'id': 1, 'action': 'wait'},
+            {'id': 2, 'action': 'release'},
+            {'id': 3, 'action': 'tag', 'params': {'name': 'one'}},
+        ], path='/rpc/concurrent/')
+        data = json.loads(r.content.decode())
+        self.assertEqual(data[0], {'id': 1, 'result': 'done'})
+        self.assertEqual(data[1], {'id': 2, 'result': 'released'})
+        self.assertIn('result', data[2])
+
+    def test_batch_atomic(self):
+        r = self.batch([
+            {'id': 1, 'action': 'tag', 'params': {'name': 'one'}},
+            {'id': 2, 'action': 'double', 'params': {'value': 2}},
+            {'id': 3, 'action': 'wait'},
+        ], path='/rpc/async-atomic/')
+        data = json.loads(r.content.decode())
+        self.assertEqual(data[1], {'id': 2, 'result': 4})
+        self.assertEqual(data[2]['error']['status'], STATUS.REQUEST_TIMEOUT)
+        self.assertFalse(Tag.objects.exists())
+
+
 class RPCClientTest(LiveServerTestCase):
 
     def setUp(self):
@@ -68,3 +244,67 @@ class RPCClientTest(LiveServerTestCase):
     def test_echo(self):
         resp = self.rpc.echo(foo='bar')
         self.assertEqual(resp, {'foo': 'bar'})
+
+    def test_method_names(self):
+        # Names of the client's own methods still call RPC methods.
+        for name in ('call', 'close', 'post', 'batch'):
+            self.assertIsInstance(getattr(self.rpc, name), client.RPCProxy)
+        self.assertEqual(self.rpc.close(foo='bar'), {'close': {'foo': 'bar'}})
+
+    def test_batch(self):
+        rpc = client.RPCClient('%s%s' % (self.live_server_url, '/rpc/batch/'))
+        with rpc._batch() as batch:
+            total = batch.add(a=1, b=2)
+            echo = batch.echo(foo='bar')
+            fail = batch.fail()
+        self.assertEqual(total.result, 3)
+        self.assertEqual(echo.result, {'foo': 'bar'})
+        with self.assertRaises(client.RPCError) as cm:
+            fail.result
+        self.assertEqual(cm.exception.status, STATUS.BAD_REQUEST)
+
+    def test_options(self):
+        rpc = client.RPCClient(self.rpc.endpoint, timeout=5, retries=2, pool_maxsize=4)
+        adapter = rpc.session.get_adapter(rpc.endpoint)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(rpc.echo(foo='bar'), {'foo': 'bar'})
+
+    @skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+    def test_msgpack(self):
+        rpc = client.RPCClient(self.rpc.endpoint, format='msgpack')
+        self.assertEqual(rpc.echo(foo='bar'), {'foo': 'bar'})
+
+    @skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+    def test_decode_msgpack(self):
+        import msgpack
+        # A JSON client still decodes a MessagePack response.
+        resp = SimpleNamespace(
+            headers={'Content-Type': 'application/msgpack'},
+            content=msgpack.packb({'foo': 'bar'}),
+        )
+        self.assertEqual(self.rpc._decode(resp), {'foo': 'bar'})
+
+    def test_retry(self):
+        from . import rpc_views
+        rpc_views.BatchView.attempts = 0
+        url = '%s%s' % (self.live_server_url, '/rpc/batch/')
+        rpc = client.RPCClient(url, retries=1, backoff_factor=0, retry_statuses=(429,))
+        self.assertEqual(rpc.flaky(), {'attempts': 2})
+        rpc = client.RPCClient(url, retry_statuses=(429,))
+        self.assertEqual(rpc._post({}, {'X-Rpc-Action': 'flaky'}).status_code, STATUS.TOO_MANY_REQUESTS)
+
+    def test_async(self):
+        async def run():
+            async with client.AsyncRPCClient(self.rpc.endpoint, timeout=5) as rpc:
+                return await asyncio.gather(*(rpc.echo(value=x) for x in range(10)))
+        results = asyncio.run(run())
+        self.assertEqual(results, [{'value': x} for x in range(10)])
+
+    def test_async_batch(self):
+        async def run():
+            async with client.AsyncRPCClient('%s%s' % (self.live_server_url, '/rpc/batch/')) as rpc:
+                async with rpc._batch() as batch:
+                    total = batch.add(a=1, b=2)
+            return total.result
+        self.assertEqual(asyncio.run(run()), 3)
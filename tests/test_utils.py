@@ -1,8 +1,15 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from importlib.util import find_spec
 from types import SimpleNamespace
+from unittest import skipUnless
+from uuid import UUID
 
 from django.test import SimpleTestCase
 
-from nap.utils import ripper
+from nap.http.response import JsonResponse, MsgpackResponse
+from nap.utils import JSONDecodeError, NapJSONEncoder, backends, formats, ripper
 
 
 class UtilsTestCase(SimpleTestCase):
@@ -17,3 +24,105 @@ class UtilsTestCase(SimpleTestCase):
             'b': '2',
             'foo': 'bar',
         })
+
+
+class Jsonable:
+
+    def __json__(self):
+        return {'json': True}
+
+
+class JsonBackendTestCase(SimpleTestCase):
+
+    data = {
+        'when': datetime(2020, 1, 2, 3, 4, 5, 678000),
+        'day': date(2020, 1, 2),
+        'amount': Decimal('1.50'),
+        'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+        'obj': Jsonable(),
+    }
+
+    expected = {
+        'when': '2020-01-02T03:04:05.678',
+        'day': '2020-01-02',
+        'amount': '1.50',
+        'uuid': '12345678-1234-5678-1234-567812345678',
+        'gen': [0, 1, 2],
+        'obj': {'json': True},
+    }
+
+    def check_backend(self, name):
+        with self.settings(NAP_JSON_BACKEND=name):
+            backend = backends.get_backend()
+            data = dict(self.data, gen=(x for x in range(3)))
+            content = JsonResponse(data).content
+            self.assertEqual(json.loads(content.decode('utf-8')), self.expected)
+            self.assertEqual(backend.loads('{"a": [1]}'), {'a': [1]})
+            with self.assertRaises(JSONDecodeError):
+                backend.loads('{')
+            return backend
+
+    def test_json(self):
+        self.assertIsInstance(self.check_backend('json'), backends.JsonBackend)
+
+    @skipUnless(find_spec('orjson'), 'orjson is not installed')
+    def test_orjson(self):
+        backend = self.check_backend('orjson')
+        self.assertIsInstance(backend, backends.OrjsonBackend)
+        # Extra arguments fall back to json
+        self.assertEqual(backend.dumps([1], NapJSONEncoder, indent=1), '[\n 1\n]')
+        # As do values orjson can not encode
+        self.assertEqual(json.loads(backend.dumps({'n': 2 ** 64}, NapJSONEncoder)), {'n': 2 ** 64})
+
+    @skipUnless(find_spec('ujson'), 'ujson is not installed')
+    def test_ujson(self):
+        backend = self.check_backend('ujson')
+        self.assertIsInstance(backend, backends.UjsonBackend)
+        # Decimals keep their exponent, even when nested
+        data = {'a': [Decimal('1.10')], 'b': (Decimal('2.0'),)}
+        self.assertEqual(json.loads(backend.dumps(data, NapJSONEncoder)), {'a': ['1.10'], 'b': ['2.0']})
+
+    def test_path(self):
+        self.assertIsInstance(
+            self.check_backend('nap.utils.backends.JsonBackend'),
+            backends.JsonBackend,
+        )
+
+
+class FormatsTestCase(SimpleTestCase):
+
+    def test_parse_accept(self):
+        self.assertEqual(
+            formats.parse_accept('text/html;level=1, application/msgpack;q=0.5, */*;q=0.1, image/png;q=0'),
+            ['text/html', 'application/msgpack', '*/*'],
+        )
+        self.assertEqual(formats.parse_accept('a/a;q=0.5,b/b;q=0.5,c/c;q=bad'), ['a/a', 'b/b'])
+
+    def test_negotiate_json(self):
+        types = ('application/msgpack',)
+        self.assertIsNone(formats.negotiate(None, types))
+        self.assertIsNone(formats.negotiate('*/*', types))
+        self.assertIsNone(formats.negotiate('application/json, application/msgpack', types))
+        self.assertIsNone(formats.negotiate('application/msgpack', ()))
+        self.assertIsNone(formats.negotiate('application/cbor', ('application/cbor',)))
+
+    @skipUnless(find_spec('msgpack') is None, 'msgpack is installed')
+    def test_negotiate_unavailable(self):
+        self.assertIsNone(formats.negotiate('application/msgpack', ('application/msgpack',)))
+
+    @skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+    def test_msgpack(self):
+        types = ('application/msgpack', 'application/x-msgpack')
+        self.assertEqual(formats.negotiate('application/msgpack', types), 'application/msgpack')
+        self.assertEqual(
+            formats.negotiate('application/json;q=0.5, application/x-msgpack', types),
+            'application/x-msgpack',
+        )
+
+        fmt = formats.get_format('application/msgpack')
+        data = dict(JsonBackendTestCase.data, gen=(x for x in range(3)))
+        response = MsgpackResponse(data)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(fmt.loads(response.content), JsonBackendTestCase.expected)
+        with self.assertRaises(ValueError):
+            fmt.loads(b'\xc1')
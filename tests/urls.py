@@ -4,8 +4,24 @@ from . import rest_views
 
 
 urlpatterns = [
+    url(r'^rpc/batch/', rpc_views.BatchView.as_view()),
+    url(r'^rpc/atomic/', rpc_views.AtomicBatchView.as_view()),
+    url(r'^rpc/async/', rpc_views.AsyncView.as_view()),
+    url(r'^rpc/concurrent/', rpc_views.ConcurrentView.as_view()),
+    url(r'^rpc/async-atomic/', rpc_views.AtomicAsyncView.as_view()),
     url(r'^rpc/', rpc_views.View.as_view()),
     url(r'^rest/polls/$', rest_views.PollListView.as_view()),
+    url(r'^rest/polls/columnar/$', rest_views.ColumnarPollListView.as_view()),
+    url(r'^rest/polls/streaming/$', rest_views.StreamingPollListView.as_view()),
+    url(r'^rest/polls/cursor/$', rest_views.CursorPollListView.as_view()),
+    url(r'^rest/polls/tagged/$', rest_views.TaggedPollListView.as_view()),
+    url(r'^rest/polls/bulk/$', rest_views.BulkPollListView.as_view()),
+    url(r'^rest/surveys/bulk/$', rest_views.BulkSurveyListView.as_view()),
+    url(r'^rest/choices/bulk/$', rest_views.BulkChoiceListView.as_view()),
+    url(r'^rest/polls/cached/$', rest_views.CachedPollListView.as_view()),
     url(r'^rest/polls/(?P<pk>\d+)$', rest_views.SinglePollView.as_view()),
-    url(r'^rest/polls/(?P<poll_id>\d+)/choice/', rest_views.ChoiceListView.as_view()),
+    url(r'^rest/polls/(?P<pk>\d+)/cached/$', rest_views.CachedSinglePollView.as_view()),
+    url(r'^rest/polls/(?P<poll_id>\d+)/choice/$', rest_views.ChoiceListView.as_view()),
+    url(r'^rest/polls/(?P<poll_id>\d+)/choice/values/$', rest_views.ValuesChoiceListView.as_view()),
+    url(r'^rest/polls/(?P<poll_id>\d+)/choice/streaming/$', rest_views.StreamingChoiceListView.as_view()),
 ]